@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def private_cache(django_test_environment):
+    """Тесты под pytest не пишут в общий файл кеша, как и под manage.py."""
+    from core.testing import private_cache
+
+    with private_cache():
+        yield
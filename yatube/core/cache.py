@@ -0,0 +1,337 @@
+"""Кеш в файле SQLite, общий для всех процессов сервера на узле.
+
+В отличие от ``LocMemCache`` воркеры gunicorn видят одни и те же записи,
+поэтому прогретая страница или карточка нужна каждому процессу только
+один раз. Файл работает в режиме WAL: чтения не ждут записи. Соединения
+процесса берутся из пула и переиспользуются потоками.
+
+``KEY_PREFIX`` задает пространство имен: ``clear()`` удаляет только ключи
+своего префикса, так что несколько приложений могут делить один файл.
+Счетчики попаданий, промахов и времени операций копятся в памяти процесса
+и периодически складываются в таблицу ``cache_metrics``; суммы по всем
+процессам возвращает ``metrics()``.
+"""
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from queue import Empty, LifoQueue
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'CREATE TABLE IF NOT EXISTS cache_metrics ('
+    'pid INTEGER PRIMARY KEY, hits INTEGER NOT NULL, '
+    'misses INTEGER NOT NULL, writes INTEGER NOT NULL, '
+    'deletes INTEGER NOT NULL, calls INTEGER NOT NULL, '
+    'seconds REAL NOT NULL, updated REAL NOT NULL)',
+)
+METRICS = ('hits', 'misses', 'writes', 'deletes', 'calls', 'seconds')
+NOT_EXPIRED = '(expires IS NULL OR expires > ?)'
+# SQLite ограничивает число параметров запроса
+MAX_PARAMS = 900
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Не больше ``size`` соединений с файлом кеша на процесс."""
+
+    def __init__(self, path, size, timeout):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.idle = LifoQueue()
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def connect(self):
+        connection = sqlite3.connect(
+            self.path, timeout=self.timeout,
+            isolation_level=None, check_same_thread=False
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        for sql in SCHEMA:
+            connection.execute(sql)
+        return connection
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except Empty:
+            pass
+        with self.lock:
+            can_open = self.opened < self.size
+            if can_open:
+                self.opened += 1
+        if not can_open:
+            return self.idle.get(timeout=self.timeout)
+        try:
+            return self.connect()
+        except Exception:
+            with self.lock:
+                self.opened -= 1
+            raise
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            if connection.in_transaction:
+                connection.rollback()
+            self.idle.put(connection)
+
+
+class Metrics:
+    """Счетчики процесса, еще не записанные в файл кеша."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = dict.fromkeys(METRICS, 0)
+        self.flushed = time.monotonic()
+
+    def add(self, **values):
+        with self.lock:
+            for name, value in values.items():
+                self.pending[name] += value
+
+    def take(self):
+        with self.lock:
+            values = self.pending
+            self.pending = dict.fromkeys(METRICS, 0)
+            self.flushed = time.monotonic()
+        return values
+
+
+def _shared_state(path, size, timeout):
+    """Пул и счетчики одни на процесс, хотя бэкенд создается на поток."""
+    key = (path, os.getpid())
+    with _registry_lock:
+        if key not in _registry:
+            _registry[key] = (ConnectionPool(path, size, timeout), Metrics())
+        return _registry[key]
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.pool, self.stats = _shared_state(
+            location,
+            int(options.get('POOL_SIZE', 4)),
+            float(options.get('BUSY_TIMEOUT', 5)),
+        )
+        self.metrics_interval = float(options.get('METRICS_INTERVAL', 10))
+        self.cull_every = int(options.get('CULL_EVERY', 100))
+
+    @contextmanager
+    def _operation(self, **values):
+        start = time.perf_counter()
+        with self.pool.connection() as connection:
+            yield connection
+            self.stats.add(
+                calls=1, seconds=time.perf_counter() - start, **values
+            )
+            if time.monotonic() - self.stats.flushed > self.metrics_interval:
+                self._flush_metrics(connection)
+
+    def _flush_metrics(self, connection):
+        values = self.stats.take()
+        connection.execute(
+            'INSERT INTO cache_metrics (pid, hits, misses, writes, deletes, '
+            'calls, seconds, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (pid) DO UPDATE SET '
+            'hits = hits + excluded.hits, misses = misses + excluded.misses, '
+            'writes = writes + excluded.writes, '
+            'deletes = deletes + excluded.deletes, '
+            'calls = calls + excluded.calls, '
+            'seconds = seconds + excluded.seconds, '
+            'updated = excluded.updated',
+            [os.getpid(), *(values[name] for name in METRICS), time.time()]
+        )
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _dump(self, value):
+        return sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        with self._operation() as connection:
+            row = connection.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {NOT_EXPIRED}',
+                [key, time.time()]
+            ).fetchone()
+        self.stats.add(hits=int(row is not None), misses=int(row is None))
+        return default if row is None else pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        made = list(keys)
+        found = {}
+        with self._operation() as connection:
+            for start in range(0, len(made), MAX_PARAMS):
+                chunk = made[start:start + MAX_PARAMS]
+                placeholders = ', '.join('?' * len(chunk))
+                found.update(connection.execute(
+                    f'SELECT key, value FROM cache WHERE key IN '
+                    f'({placeholders}) AND {NOT_EXPIRED}',
+                    [*chunk, time.time()]
+                ))
+        self.stats.add(hits=len(found), misses=len(keys) - len(found))
+        return {keys[key]: pickle.loads(value) for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self._key(key, version), self._dump(value), expires)
+            for key, value in data.items()
+        ]
+        with self._operation(writes=len(rows)) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)', rows
+            )
+            connection.execute('COMMIT')
+        self._maybe_cull(len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._operation(writes=1) as connection:
+            cursor = connection.execute(
+                'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET '
+                'value = excluded.value, expires = excluded.expires '
+                'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+                [key, self._dump(value), self.get_backend_timeout(timeout),
+                 now]
+            )
+        self._maybe_cull(1)
+        return cursor.rowcount > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._operation() as connection:
+            cursor = connection.execute(
+                f'UPDATE cache SET expires = ? WHERE key = ? '
+                f'AND {NOT_EXPIRED}',
+                [self.get_backend_timeout(timeout), key, time.time()]
+            )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._operation(writes=1) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {NOT_EXPIRED}',
+                [key, time.time()]
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                [self._dump(value), key]
+            )
+            connection.execute('COMMIT')
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        with self._operation() as connection:
+            row = connection.execute(
+                f'SELECT 1 FROM cache WHERE key = ? AND {NOT_EXPIRED}',
+                [key, time.time()]
+            ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        with self._operation(deletes=len(keys)) as connection:
+            for start in range(0, len(keys), MAX_PARAMS):
+                chunk = keys[start:start + MAX_PARAMS]
+                placeholders = ', '.join('?' * len(chunk))
+                connection.execute(
+                    f'DELETE FROM cache WHERE key IN ({placeholders})', chunk
+                )
+
+    def clear(self):
+        with self._operation() as connection:
+            if not self.key_prefix:
+                connection.execute('DELETE FROM cache')
+                return
+            namespace = self.key_prefix + ':'
+            connection.execute(
+                'DELETE FROM cache WHERE substr(key, 1, ?) = ?',
+                [len(namespace), namespace]
+            )
+
+    def _maybe_cull(self, written):
+        """В среднем раз в CULL_EVERY записей удаляет лишние записи."""
+        if random.random() * self.cull_every > written:
+            return
+        with self.pool.connection() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE expires <= ?', [time.time()]
+            )
+            total = connection.execute(
+                'SELECT COUNT(*) FROM cache'
+            ).fetchone()[0]
+            if total <= self._max_entries:
+                return
+            excess = (
+                total // self._cull_frequency if self._cull_frequency
+                else total
+            )
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                [max(excess, 1)]
+            )
+
+    def metrics(self):
+        """Суммарные счетчики всех процессов и размер кеша."""
+        with self.pool.connection() as connection:
+            self._flush_metrics(connection)
+            totals = connection.execute(
+                'SELECT ' + ', '.join(
+                    f'COALESCE(SUM({name}), 0)' for name in METRICS
+                ) + ' FROM cache_metrics'
+            ).fetchone()
+            entries = connection.execute(
+                f'SELECT COUNT(*) FROM cache WHERE {NOT_EXPIRED}',
+                [time.time()]
+            ).fetchone()[0]
+        report = dict(zip(METRICS, totals))
+        lookups = report['hits'] + report['misses']
+        report['hit_ratio'] = report['hits'] / lookups if lookups else 0.0
+        report['avg_ms'] = (
+            report['seconds'] / report['calls'] * 1000
+            if report['calls'] else 0.0
+        )
+        report['entries'] = entries
+        return report
@@ -0,0 +1,122 @@
+"""Чтение с реплик базы данных.
+
+``ReplicaRouter`` отправляет чтения на одну из ``DATABASE_REPLICAS``
+только внутри безопасных запросов, помеченных ``ReplicaMiddleware``;
+команды, фоновые задачи и любые записи работают с основной базой.
+После собственной записи пользователь еще ``REPLICA_STICKY_SECONDS``
+читает из основной базы, пока реплики догоняют ее (read-your-writes).
+Блок ``primary()`` читает из основной базы и в безопасном запросе: так
+рендерится все, что потом попадает в общий кеш.
+"""
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'primary_db'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = threading.local()
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def use_replicas(enabled):
+    _state.replicas = enabled
+
+
+def reading_from_replicas():
+    return getattr(_state, 'replicas', False)
+
+
+def wrote():
+    """Текущий запрос уже писал в основную базу."""
+    return getattr(_state, 'wrote', False)
+
+
+@contextmanager
+def primary():
+    """Чтения внутри блока идут в основную базу."""
+    enabled = reading_from_replicas()
+    use_replicas(False)
+    try:
+        yield
+    finally:
+        # после записи запрос читает свои данные до конца
+        use_replicas(enabled and not wrote())
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if aliases and reading_from_replicas():
+            return random.choice(aliases)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # запрос, который пишет, дальше читает свои же данные
+        use_replicas(False)
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *replicas()}
+        if {obj1._state.db, obj2._state.db} <= aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Разрешает чтение с реплик для безопасных запросов без записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sticky = STICKY_COOKIE in request.COOKIES
+        use_replicas(request.method in SAFE_METHODS and not sticky)
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+            # profile_follow и другие GET-вью тоже пишут
+            written = wrote() or request.method not in SAFE_METHODS
+        finally:
+            use_replicas(False)
+            _state.wrote = False
+        if written and replicas():
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True
+            )
+        return response
+
+
+def copy_sqlite(source, target_path):
+    """Согласованная копия базы SQLite через backup API."""
+    source.ensure_connection()
+    target = sqlite3.connect(target_path)
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
+
+
+def sync_replicas(aliases=None):
+    """Копирует основную базу SQLite в файлы реплик."""
+    primary = connections[DEFAULT_DB_ALIAS]
+    synced = []
+    for alias in aliases or replicas():
+        copy_sqlite(primary, connections[alias].settings_dict['NAME'])
+        connections[alias].close()
+        synced.append(alias)
+    return synced
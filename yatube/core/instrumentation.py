@@ -0,0 +1,200 @@
+"""Учет SQL-запросов и рендеринга шаблонов по запросам к сайту.
+
+``QueryRecorder`` подключается через ``connection.execute_wrapper`` и
+работает без ``DEBUG``. Одинаковый SQL с разными параметрами считается
+повтором: так выглядит N+1 при обходе списка в шаблоне.
+
+``RenderRecorder`` засекает каждый ``Template._render``, в том числе
+включения и родительские шаблоны, и считает для шаблона полное время и
+собственное время без вложенных шаблонов.
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration in self.queries)
+
+    @property
+    def duplicates(self):
+        """SQL, выполненный больше одного раза, и число повторов."""
+        fingerprints = Counter(sql for sql, _ in self.queries)
+        return {sql: total for sql, total in fingerprints.items() if total > 1}
+
+
+@contextmanager
+def record_queries():
+    """Записывает запросы ко всем базам внутри блока."""
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+
+
+class RenderRecorder:
+    def __init__(self):
+        self.templates = defaultdict(lambda: {
+            'renders': 0, 'total': 0.0, 'self': 0.0,
+        })
+        self.stack = []
+        self.duration = 0.0
+
+    def render(self, render, template, context):
+        self.stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return render(template, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += elapsed
+            else:
+                self.duration += elapsed
+            stats = self.templates[template.name or '<string>']
+            stats['renders'] += 1
+            stats['total'] += elapsed
+            stats['self'] += elapsed - nested
+
+    def report(self):
+        """Шаблоны по убыванию собственного времени, в миллисекундах."""
+        return [
+            {
+                'template': name,
+                'renders': stats['renders'],
+                'total_ms': round(stats['total'] * 1000, 3),
+                'self_ms': round(stats['self'] * 1000, 3),
+            }
+            for name, stats in sorted(
+                self.templates.items(), key=lambda item: -item[1]['self']
+            )
+        ]
+
+
+_render_state = threading.local()
+_original_render = None
+_patch_lock = threading.Lock()
+
+
+def _timed_render(template, context):
+    recorder = getattr(_render_state, 'recorder', None)
+    if recorder is None:
+        return _original_render(template, context)
+    return recorder.render(_original_render, template, context)
+
+
+@contextmanager
+def record_templates():
+    """Засекает рендеринг шаблонов текущего потока внутри блока."""
+    global _original_render
+    with _patch_lock:
+        if Template._render is not _timed_render:
+            _original_render = Template._render
+            Template._render = _timed_render
+    recorder = RenderRecorder()
+    previous = getattr(_render_state, 'recorder', None)
+    _render_state.recorder = recorder
+    try:
+        yield recorder
+    finally:
+        _render_state.recorder = previous
+
+
+class QueryCountMiddleware:
+    """Добавляет в ответ заголовки с числом и временем SQL-запросов."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_INSTRUMENTATION', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        duplicates = recorder.duplicates
+        response['X-DB-Query-Count'] = recorder.count
+        response['X-DB-Time-Ms'] = f'{recorder.duration * 1000:.2f}'
+        response['X-DB-Duplicate-Queries'] = sum(duplicates.values())
+        match = request.resolver_match
+        logger.info(
+            '%s %s view=%s queries=%d duplicates=%d db_ms=%.2f',
+            request.method, request.path,
+            match.view_name if match else '-',
+            recorder.count, sum(duplicates.values()),
+            recorder.duration * 1000,
+        )
+        return response
+
+
+class TemplateTimingMiddleware:
+    """Добавляет в ответ время рендеринга шаблонов и пишет разбивку в лог."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'TEMPLATE_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with record_templates() as recorder:
+            response = self.get_response(request)
+            # TemplateResponse рендерится только при обращении к content
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+        response['X-Template-Time-Ms'] = f'{recorder.duration * 1000:.2f}'
+        logger.info(
+            '%s %s templates_ms=%.2f %s',
+            request.method, request.path, recorder.duration * 1000,
+            ' '.join(
+                f"{row['template']}={row['self_ms']}x{row['renders']}"
+                for row in recorder.report()
+            ),
+        )
+        return response
+
+
+class QueryBudgetMixin:
+    """Проверки числа запросов для ``TestCase``."""
+
+    def assertQueryBudget(self, budget, url, client=None, duplicates=False):
+        """Запрос к url укладывается в бюджет и не содержит N+1."""
+        client = client or self.client
+        with record_queries() as recorder:
+            response = client.get(url)
+        report = '\n'.join(sql for sql, _ in recorder.queries)
+        self.assertLessEqual(
+            recorder.count, budget,
+            f'{url}: {recorder.count} запросов при бюджете {budget}\n'
+            f'{report}'
+        )
+        if not duplicates:
+            self.assertEqual(
+                recorder.duplicates, {}, f'{url}: повторяющиеся запросы'
+            )
+        return response
@@ -0,0 +1,28 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания, промахи и время операций общего кеша.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--alias', default='default', help='Имя кеша из CACHES'
+        )
+
+    def handle(self, *args, **options):
+        cache = caches[options['alias']]
+        if not hasattr(cache, 'metrics'):
+            raise CommandError(
+                f'Кеш {options["alias"]} не собирает статистику'
+            )
+        report = cache.metrics()
+        self.stdout.write(
+            'Записей: {entries}\n'
+            'Попаданий: {hits}, промахов: {misses}, '
+            'доля попаданий: {hit_ratio:.1%}\n'
+            'Записано: {writes}, удалено: {deletes}\n'
+            'Операций: {calls}, среднее время: {avg_ms:.3f} мс'.format(
+                **report
+            )
+        )
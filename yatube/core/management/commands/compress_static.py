@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.staticfiles import brotli, compress_tree
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересжимает собранную статику в копии .gz и .br '
+        '(collectstatic делает это сам).'
+    )
+
+    def handle(self, *args, **options):
+        if not settings.STATIC_ROOT:
+            raise CommandError('Не задан STATIC_ROOT')
+        written = compress_tree(settings.STATIC_ROOT)
+        self.stdout.write(f'Записано сжатых копий: {written}')
+        if brotli is None:
+            self.stdout.write('Пакет brotli не установлен, копий .br нет')
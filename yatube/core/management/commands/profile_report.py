@@ -0,0 +1,61 @@
+import pstats
+from io import StringIO
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import aggregate, default_store
+
+
+class Command(BaseCommand):
+    help = (
+        'Складывает образцы ProfilingMiddleware и показывает медленные '
+        'вью, SQL, шаблоны и самые горячие функции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='Только образцы этого вью')
+        parser.add_argument(
+            '--slow', action='store_true',
+            help='Только запросы дольше PROFILE_SLOW_MS'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=20, help='Строк в каждом разделе'
+        )
+        parser.add_argument(
+            '--sort', default='cumulative',
+            choices=['cumulative', 'tottime', 'ncalls'],
+            help='Порядок функций профиля'
+        )
+
+    def handle(self, *args, **options):
+        samples = [
+            sample for sample in default_store().samples()
+            if (not options['view'] or sample['view'] == options['view'])
+            and (not options['slow'] or sample['slow'])
+        ]
+        if not samples:
+            raise CommandError('Нет образцов профилирования')
+        report = aggregate(samples)
+        limit = options['limit']
+        self.stdout.write(
+            f'Образцов: {len(samples)}, '
+            f'с профилем: {len(report["profiles"])}\n\nВью:'
+        )
+        for view, count, average, slowest in report['views'][:limit]:
+            self.stdout.write(
+                f'  {view}: {count} запросов, среднее {average:.1f} мс, '
+                f'максимум {slowest:.1f} мс'
+            )
+        self.stdout.write('\nSQL по суммарному времени:')
+        for sql, count, total in report['queries'][:limit]:
+            self.stdout.write(f'  {total:.1f} мс, {count} раз: {sql[:200]}')
+        self.stdout.write('\nШаблоны по собственному времени:')
+        for name, renders, total in report['templates'][:limit]:
+            self.stdout.write(f'  {total:.1f} мс, {renders} раз: {name}')
+        if report['profiles']:
+            self.stdout.write('\nФункции:')
+            # OutputWrapper дописывает перевод строки к каждому print
+            output = StringIO()
+            stats = pstats.Stats(*report['profiles'], stream=output)
+            stats.strip_dirs().sort_stats(options['sort']).print_stats(limit)
+            self.stdout.write(output.getvalue())
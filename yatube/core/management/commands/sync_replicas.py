@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import db
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу SQLite в файлы реплик для чтения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'aliases', nargs='*',
+            help='Реплики из DATABASES (по умолчанию DATABASE_REPLICAS)'
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or db.replicas()
+        if not aliases:
+            raise CommandError('Реплики не настроены: DATABASE_REPLICAS пуст')
+        for alias in ['default', *aliases]:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(
+                    f'{alias}: копирование поддерживается только для SQLite'
+                )
+        for alias in db.sync_replicas(aliases):
+            self.stdout.write(f'Реплика {alias} обновлена')
@@ -10,3 +10,32 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class CountersModel(models.Model):
+    """Абстрактная модель. Не перезаписывает счетчики при сохранении.
+
+    Счетчики из ``counter_fields`` меняются только атомарными
+    UPDATE, поэтому обычный ``save()`` загруженного объекта не должен
+    записывать в базу их устаревшие значения.
+    """
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # копия через pk = None и явные force_* сохраняются как обычно
+        forced = any(args[:2]) or kwargs.get('force_insert') or kwargs.get(
+            'force_update'
+        )
+        if (
+            not self._state.adding and self.pk is not None and not forced
+            and not kwargs.get('update_fields')
+        ):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
@@ -0,0 +1,213 @@
+"""Выборочное профилирование запросов в рабочем окружении.
+
+``ProfilingMiddleware`` профилирует cProfile долю запросов
+``PROFILE_SAMPLE_RATE``. Запрос дольше ``PROFILE_SLOW_MS`` записывается
+всегда, даже не попав в выборку: тогда в образце есть SQL и шаблоны, но
+нет профиля, а следующий запрос к тому же вью профилируется целиком.
+SQL-запросы и время шаблонов пишутся для каждого образца через
+``core.instrumentation``.
+
+Образцы лежат в ``PROFILE_DIR``: профиль в формате ``pstats`` и JSON с
+описанием запроса. Хранится не больше ``PROFILE_MAX_SAMPLES`` образцов,
+старые удаляются. ``manage.py profile_report`` складывает профили и
+показывает самые горячие функции, запросы и шаблоны.
+"""
+import cProfile
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+
+from .instrumentation import record_queries, record_templates
+
+# больше запросов в образце не сохраняется, их число пишется целиком
+MAX_QUERIES = 500
+
+
+def _write(path, write):
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+    os.close(fd)
+    try:
+        write(temporary)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+class ProfileStore:
+    """Каталог образцов ``<время>-<id>.json`` и ``<время>-<id>.prof``."""
+
+    def __init__(self, directory, max_samples):
+        self.directory = directory
+        self.max_samples = max_samples
+
+    def save(self, sample, profiler=None):
+        os.makedirs(self.directory, exist_ok=True)
+        stem = f'{time.time():.6f}-{uuid.uuid4().hex[:8]}'
+        base = os.path.join(self.directory, stem)
+        if profiler is not None:
+            _write(base + '.prof', profiler.dump_stats)
+            sample['profile'] = stem + '.prof'
+
+        def write_json(path):
+            with open(path, 'w') as output:
+                json.dump(sample, output, ensure_ascii=False)
+
+        _write(base + '.json', write_json)
+        self.rotate()
+        return stem
+
+    def stems(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            name[:-len('.json')] for name in names if name.endswith('.json')
+        )
+
+    def rotate(self):
+        stems = self.stems()
+        for stem in stems[:max(len(stems) - self.max_samples, 0)]:
+            for suffix in ('.json', '.prof'):
+                try:
+                    os.remove(os.path.join(self.directory, stem + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def samples(self):
+        """Образцы от старых к новым; ``profile`` — полный путь или None."""
+        for stem in self.stems():
+            try:
+                with open(os.path.join(self.directory, stem + '.json')) as f:
+                    sample = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue
+            if sample.get('profile'):
+                sample['profile'] = os.path.join(
+                    self.directory, sample['profile']
+                )
+            yield sample
+
+
+def default_store():
+    return ProfileStore(settings.PROFILE_DIR, settings.PROFILE_MAX_SAMPLES)
+
+
+class ProfilingMiddleware:
+    """Профилирует выборку запросов и медленные запросы."""
+
+    def __init__(self, get_response):
+        self.rate = settings.PROFILE_SAMPLE_RATE
+        self.slow_ms = settings.PROFILE_SLOW_MS
+        if self.rate <= 0 and self.slow_ms is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.store = default_store()
+        # вью, чьи медленные запросы попали в образцы без профиля
+        self.profile_next = set()
+        # cProfile нельзя запускать в нескольких потоках одновременно
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        view = self.view_name(request)
+        profiler = None
+        wanted = random.random() < self.rate or view in self.profile_next
+        if wanted and self.lock.acquire(blocking=False):
+            self.profile_next.discard(view)
+            profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            with record_queries() as queries:
+                with record_templates() as templates:
+                    response = self.process(request, profiler)
+        finally:
+            if profiler is not None:
+                self.lock.release()
+        elapsed = (time.perf_counter() - start) * 1000
+        slow = self.slow_ms is not None and elapsed >= self.slow_ms
+        if profiler is None and slow:
+            self.profile_next.add(view)
+        if profiler is not None or slow:
+            self.store.save({
+                'method': request.method,
+                'path': request.path,
+                'view': view,
+                'status': response.status_code,
+                'duration_ms': round(elapsed, 3),
+                'slow': slow,
+                'query_count': queries.count,
+                'queries': [
+                    [sql, round(duration * 1000, 3)]
+                    for sql, duration in queries.queries[:MAX_QUERIES]
+                ],
+                'templates': templates.report(),
+            }, profiler)
+        return response
+
+    def process(self, request, profiler):
+        if profiler is not None:
+            profiler.enable()
+        try:
+            response = self.get_response(request)
+            # TemplateResponse рендерится только при обращении к content
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+            return response
+        finally:
+            if profiler is not None:
+                profiler.disable()
+
+    @staticmethod
+    def view_name(request):
+        try:
+            return resolve(request.path_info).view_name
+        except Resolver404:
+            return '-'
+
+
+def aggregate(samples):
+    """Сводка образцов по вью, SQL и шаблонам и список файлов профилей."""
+    views = {}
+    queries = {}
+    templates = {}
+    profiles = []
+    for sample in samples:
+        views.setdefault(sample['view'], []).append(sample['duration_ms'])
+        for sql, duration in sample['queries']:
+            stats = queries.setdefault(sql, [0, 0.0])
+            stats[0] += 1
+            stats[1] += duration
+        for row in sample['templates']:
+            stats = templates.setdefault(row['template'], [0, 0.0])
+            stats[0] += row['renders']
+            stats[1] += row['self_ms']
+        if sample.get('profile') and os.path.exists(sample['profile']):
+            profiles.append(sample['profile'])
+    return {
+        'views': sorted(
+            (
+                (view, len(durations), sum(durations) / len(durations),
+                 max(durations))
+                for view, durations in views.items()
+            ),
+            key=lambda row: -row[1] * row[2]
+        ),
+        'queries': sorted(
+            ((sql, *stats) for sql, stats in queries.items()),
+            key=lambda row: -row[2]
+        ),
+        'templates': sorted(
+            ((name, *stats) for name, stats in templates.items()),
+            key=lambda row: -row[2]
+        ),
+        'profiles': profiles,
+    }
@@ -0,0 +1,104 @@
+"""Статика с хешами в именах и заранее сжатыми копиями.
+
+``collectstatic`` с ``CompressedManifestStorage`` раскладывает файлы
+под именами с хешем содержимого, записывает манифест
+``staticfiles.json`` и рядом с текстовыми файлами кладет сжатые копии
+``.gz`` и, если установлен пакет ``brotli``, ``.br``. Сжатие делается
+один раз при выкладке с максимальным уровнем, а ``core.wsgi.FileServer``
+только выбирает подходящую копию. ``manage.py compress_static``
+пересжимает уже собранную статику.
+"""
+import gzip
+import os
+import tempfile
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = {
+    '.css', '.js', '.json', '.map', '.svg', '.ico', '.txt', '.html',
+    '.xml', '.eot', '.ttf', '.otf',
+}
+# кодировки сжатых копий в порядке предпочтения и суффиксы их файлов
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+# копия, которая сжимает меньше, не стоит отдельного файла
+MIN_RATIO = 0.95
+
+
+def _gzip(data):
+    return gzip.compress(data, 9, mtime=0)
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+def compressors():
+    """Доступные кодировки: ``[(суффикс, функция сжатия)]``."""
+    available = {'gzip': _gzip}
+    if brotli is not None:
+        available['br'] = _brotli
+    return [
+        (suffix, available[encoding])
+        for encoding, suffix in ENCODINGS if encoding in available
+    ]
+
+
+def _write(path, data):
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as output:
+        output.write(data)
+    os.chmod(temporary, 0o644)
+    os.replace(temporary, path)
+
+
+def compress_file(path):
+    """Пишет сжатые копии файла, возвращает число записанных копий."""
+    if os.path.splitext(path)[1].lower() not in COMPRESSIBLE:
+        return 0
+    mtime = os.path.getmtime(path)
+    data = None
+    written = 0
+    for suffix, compress in compressors():
+        target = path + suffix
+        if os.path.exists(target) and os.path.getmtime(target) >= mtime:
+            continue
+        if data is None:
+            with open(path, 'rb') as source:
+                data = source.read()
+        compressed = compress(data)
+        if len(compressed) < len(data) * MIN_RATIO:
+            _write(target, compressed)
+            written += 1
+        elif os.path.exists(target):
+            os.remove(target)
+    return written
+
+
+def compress_tree(root):
+    """Сжимает все подходящие файлы каталога, возвращает число копий."""
+    suffixes = tuple(suffix for _, suffix in ENCODINGS)
+    written = 0
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if not name.endswith(suffixes):
+                written += compress_file(os.path.join(directory, name))
+    return written
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+    def stored_name(self, name):
+        # до первого collectstatic манифеста нет, и ссылки ведут на
+        # исходные имена, как при DEBUG
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if not dry_run:
+            compress_tree(self.location)
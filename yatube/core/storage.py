@@ -0,0 +1,89 @@
+"""Хранилище файлов по хешу содержимого.
+
+Файл сохраняется под именем ``<каталог>/ab/cd/<sha256>.<расширение>``,
+где каталог берется из ``upload_to``, а ``ab/cd`` — первые байты хеша,
+чтобы в одном каталоге не копились сотни тысяч файлов. Одинаковое
+содержимое получает одно и то же имя: второй файл не записывается, а
+имя переиспользуется. Суффиксов от совпадения имен не бывает.
+
+Содержимое под таким именем никогда не меняется, поэтому URL можно
+отдавать с ``Cache-Control: immutable`` и сроком в год. Удалять файл
+можно, только когда на него не осталось ссылок, — это решает
+приложение, которому принадлежат файлы.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME = re.compile(
+    r'(?:^|/)([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.\w+$'
+)
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+CHUNK_SIZE = 64 * 1024
+
+
+def is_hashed(name):
+    """Имя выдано хранилищем по хешу, и содержимое под ним не меняется."""
+    return bool(HASHED_NAME.search(name))
+
+
+def hashed_name(name, digest):
+    """Имя для содержимого с хешем ``digest`` вместо имени ``name``."""
+    directory, basename = posixpath.split(name)
+    extension = posixpath.splitext(basename)[1].lower()
+    return posixpath.join(
+        directory, digest[:2], digest[2:4], digest + extension
+    )
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # имя все равно заменит хеш, а одинаковое содержимое — один файл
+        return name
+
+    def _save(self, name, content):
+        directory = self.path(posixpath.dirname(name))
+        os.makedirs(directory, exist_ok=True)
+        # файл пишется рядом и переименовывается, поэтому читатели
+        # никогда не видят его частично записанным
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix='.upload')
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as output:
+                content.seek(0)
+                for chunk in content.chunks(CHUNK_SIZE):
+                    digest.update(chunk)
+                    output.write(chunk)
+            name = hashed_name(name, digest.hexdigest())
+            path = self.path(name)
+            if os.path.exists(path):
+                # свежая отметка времени защищает файл от удаления, пока
+                # новая ссылка на него еще не сохранена
+                os.utime(path)
+                return name
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # mkstemp создает файл только для владельца
+            os.chmod(temporary, self.file_permissions_mode or 0o644)
+            os.replace(temporary, path)
+            return name
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+
+content_storage = ContentAddressedStorage()
@@ -0,0 +1,85 @@
+"""Загрузчики шаблонов для production-профиля.
+
+``InliningLoader`` при загрузке подставляет текст часто используемых
+``{% include %}`` прямо в шаблон. Включение в цикле больше не ищет и не
+рендерит отдельный шаблон на каждой итерации. Подстановка обернута в
+``{% with %}``, поэтому переменные включения, как и раньше, не выходят за
+его пределы. Включения с ``only`` и с именем из переменной не трогаются.
+"""
+import re
+
+from django.template import Origin, TemplateDoesNotExist
+from django.template.loaders.base import Loader as BaseLoader
+
+INCLUDE = re.compile(
+    r"{%\s*include\s+(?P<quote>['\"])(?P<name>[^'\"]+)(?P=quote)"
+    r"(?:\s+with\s+(?P<extra>.*?))?\s*%}"
+)
+MAX_DEPTH = 5
+
+DEFAULT_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+PROFILES = ('default', 'cached', 'inlined')
+
+
+def profile_loaders(profile, includes=()):
+    """Загрузчики для профиля: default, cached или inlined."""
+    if profile not in PROFILES:
+        raise ValueError(f'Неизвестный профиль шаблонов: {profile}')
+    if profile == 'default':
+        return list(DEFAULT_LOADERS)
+    loaders = DEFAULT_LOADERS
+    if profile == 'inlined':
+        loaders = [
+            ('core.template_loaders.InliningLoader', loaders, list(includes))
+        ]
+    return [('django.template.loaders.cached.Loader', loaders)]
+
+
+class InliningLoader(BaseLoader):
+    def __init__(self, engine, loaders, includes=()):
+        super().__init__(engine)
+        self.loaders = engine.get_template_loaders(loaders)
+        self.includes = set(includes)
+
+    def get_template_sources(self, template_name):
+        for loader in self.loaders:
+            for source in loader.get_template_sources(template_name):
+                origin = Origin(source.name, source.template_name, self)
+                origin.source = source
+                yield origin
+
+    def source(self, name):
+        for origin in self.get_template_sources(name):
+            try:
+                return origin.source.loader.get_contents(origin.source)
+            except TemplateDoesNotExist:
+                continue
+        raise TemplateDoesNotExist(name)
+
+    def inline(self, contents, depth=0):
+        if depth >= MAX_DEPTH:
+            return contents
+
+        def replace(match):
+            name = match.group('name')
+            extra = match.group('extra') or ''
+            if name not in self.includes or re.search(r'\bonly\b', extra):
+                return match.group(0)
+            body = self.inline(self.source(name), depth + 1)
+            return (
+                f"{{% with included_template='{name}' {extra} %}}"
+                f"{body}{{% endwith %}}"
+            )
+        return INCLUDE.sub(replace, contents)
+
+    def get_contents(self, origin):
+        source = origin.source
+        return self.inline(source.loader.get_contents(source))
+
+    def reset(self):
+        for loader in self.loaders:
+            if hasattr(loader, 'reset'):
+                loader.reset()
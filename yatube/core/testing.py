@@ -0,0 +1,40 @@
+"""Запуск тестов проекта.
+
+Кеш по умолчанию — общий файл SQLite на узле. Тесты получают свой файл
+во временном каталоге, поэтому их ``cache.clear()`` не трогает кеш
+запущенного сервера, а параллельные прогоны — друг друга. Под pytest
+то же делает фикстура из ``conftest.py`` в корне репозитория.
+"""
+import copy
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+@contextmanager
+def private_cache():
+    """Кеш по умолчанию в собственном временном каталоге."""
+    directory = tempfile.mkdtemp(prefix='yatube-cache-')
+    caches = copy.deepcopy(settings.CACHES)
+    caches['default']['LOCATION'] = os.path.join(directory, 'cache.sqlite3')
+    try:
+        with override_settings(CACHES=caches):
+            yield
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache = private_cache()
+        self.cache.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
@@ -1,5 +1,33 @@
-from django.test import TestCase
+import gzip
+import os
+import sqlite3
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection, router
+from django.http import HttpResponse
+from django.template import Context, Engine
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
 from http import HTTPStatus
+from io import StringIO
+
+from . import db
+from .cache import SQLiteCache
+from .instrumentation import record_templates
+from .profiling import default_store
+from .staticfiles import compress_tree
+from .storage import IMMUTABLE_CACHE_CONTROL, ContentAddressedStorage
+from .template_loaders import profile_loaders
+from .testing import private_cache
+from .views import serve_media
+from .wsgi import FileServer
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +36,471 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class TestCacheTest(TestCase):
+    def test_private_cache_file(self):
+        """Тесты не пишут в общий файл кеша из настроек"""
+        self.assertNotEqual(
+            cache.path,
+            os.path.join(tempfile.gettempdir(), 'yatube-cache.sqlite3')
+        )
+        self.assertTrue(
+            os.path.basename(os.path.dirname(cache.path)).startswith(
+                'yatube-cache-'
+            )
+        )
+
+    def test_private_cache_is_isolated(self):
+        """Записи и сброс временного кеша не доходят до внешнего"""
+        cache.set('outer', 1)
+        with private_cache():
+            path = cache.path
+            self.assertIsNone(cache.get('outer'))
+            cache.set('inner', 1)
+            cache.clear()
+        self.assertEqual(cache.get('outer'), 1)
+        self.assertIsNone(cache.get('inner'))
+        self.assertFalse(os.path.exists(path))
+
+
+class SQLiteCacheTest(TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(self.remove_files)
+        self.cache = self.make_cache('app')
+
+    def remove_files(self):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def make_cache(self, prefix, **options):
+        return SQLiteCache(self.path, {
+            'KEY_PREFIX': prefix,
+            'OPTIONS': {'METRICS_INTERVAL': 3600, **options},
+        })
+
+    def test_operations(self):
+        """Кеш поддерживает основные операции Django"""
+        cache = self.cache
+        cache.set('a', {'value': 1})
+        self.assertEqual(cache.get('a'), {'value': 1})
+        self.assertIsNone(cache.get('missing'))
+        self.assertFalse(cache.add('a', 2))
+        self.assertTrue(cache.add('b', 2))
+        cache.set_many({'c': 3, 'd': 4})
+        self.assertEqual(
+            cache.get_many(['a', 'b', 'c', 'missing']),
+            {'a': {'value': 1}, 'b': 2, 'c': 3}
+        )
+        self.assertEqual(cache.incr('b', 5), 7)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.delete_many(['c', 'd'])
+        self.assertFalse(cache.has_key('c'))
+        cache.set('expired', 1, timeout=-1)
+        self.assertIsNone(cache.get('expired'))
+        self.assertTrue(cache.add('expired', 2))
+        self.assertEqual(cache.get('expired'), 2)
+
+    def test_shared_and_namespaced(self):
+        """Экземпляры делят файл, clear() чистит только свой префикс"""
+        other = self.make_cache('other')
+        self.make_cache('app').set('key', 'app')
+        other.set('key', 'other')
+        self.assertEqual(self.cache.get('key'), 'app')
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(other.get('key'), 'other')
+
+    def test_metrics(self):
+        """Попадания и промахи суммируются в файле кеша"""
+        self.cache.set('key', 1)
+        self.cache.get('key')
+        self.cache.get_many(['key', 'missing'])
+        report = self.cache.metrics()
+        self.assertGreaterEqual(report['hits'], 2)
+        self.assertGreaterEqual(report['misses'], 1)
+        self.assertEqual(report['entries'], 1)
+
+    def test_cull(self):
+        """Лишние записи удаляются при превышении MAX_ENTRIES"""
+        cache = self.make_cache('app', MAX_ENTRIES=10, CULL_EVERY=1)
+        for number in range(30):
+            cache.set(f'key{number}', number)
+        self.assertLessEqual(cache.metrics()['entries'], 11)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(TestCase):
+    def route(self, method='get', cookies=None, write=False):
+        """Куда пошло бы чтение внутри запроса."""
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        routed = {}
+
+        def view(request):
+            if write:
+                router.db_for_write(User)
+            routed['read'] = router.db_for_read(User)
+            return HttpResponse()
+
+        response = db.ReplicaMiddleware(view)(request)
+        return routed['read'], response
+
+    def test_safe_requests_read_from_replicas(self):
+        """GET читает с реплики, вне запроса чтение идет в основную базу"""
+        alias, response = self.route()
+        self.assertEqual(alias, 'replica')
+        self.assertNotIn(db.STICKY_COOKIE, response.cookies)
+        self.assertEqual(router.db_for_read(User), 'default')
+
+    def test_writes_stick_to_primary(self):
+        """После записи пользователь читает из основной базы"""
+        alias, response = self.route('post')
+        self.assertEqual(alias, 'default')
+        self.assertIn(db.STICKY_COOKIE, response.cookies)
+        alias, _ = self.route(cookies={db.STICKY_COOKIE: '1'})
+        self.assertEqual(alias, 'default')
+        alias, response = self.route(write=True)
+        self.assertEqual(alias, 'default')
+        self.assertIn(db.STICKY_COOKIE, response.cookies)
+        self.assertEqual(router.db_for_write(User), 'default')
+
+    # реплики в тестах нет, чтения идут в ту же базу
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_follow_by_get_sticks_to_primary(self):
+        """Подписка GET-запросом тоже закрепляет чтение за основной базой"""
+        author = User.objects.create_user(username='author')
+        self.client.force_login(User.objects.create_user(username='reader'))
+        response = self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'author'})
+        )
+        self.assertIn(db.STICKY_COOKIE, response.cookies)
+        self.assertTrue(author.following.exists())
+
+    def test_primary_block(self):
+        """В блоке primary чтение идет в основную базу"""
+        db.use_replicas(True)
+        self.addCleanup(db.use_replicas, False)
+        with db.primary():
+            self.assertEqual(router.db_for_read(User), 'default')
+        self.assertEqual(router.db_for_read(User), 'replica')
+        with db.primary():
+            router.db_for_write(User)
+        self.assertEqual(router.db_for_read(User), 'default')
+
+    def test_copy_sqlite(self):
+        """Реплика SQLite получает копию основной базы"""
+        handle, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        db.copy_sqlite(connection, path)
+        replica = sqlite3.connect(path)
+        self.addCleanup(replica.close)
+        tables = {row[0] for row in replica.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )}
+        self.assertIn('posts_post', tables)
+
+
+class TemplateProfilesTest(TestCase):
+    TEMPLATES = {
+        'page.html': (
+            '{% for item in items %}'
+            '{% include "item.html" with label=item %}{% endfor %}'
+            '[{{ label }}]{% include "item.html" with label="x" only %}'
+        ),
+        'item.html': '<{{ label }}{% include "mark.html" %}>',
+        'mark.html': '{% with mark="!" %}{{ mark }}{% endwith %}',
+    }
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for name, text in self.TEMPLATES.items():
+            with open(os.path.join(directory.name, name), 'w') as target:
+                target.write(text)
+        self.directory = directory.name
+
+    def render(self, profile):
+        engine = Engine(dirs=[self.directory], loaders=profile_loaders(
+            profile, ['item.html', 'mark.html']
+        ))
+        template = engine.get_template('page.html')
+        return template, template.render(Context({'items': [1, 2]}))
+
+    def test_profiles_render_the_same(self):
+        """Все профили загрузчиков дают одинаковый результат"""
+        _, expected = self.render('default')
+        self.assertEqual(expected, '<1!><2!>[]<x!>')
+        for profile in ('cached', 'inlined'):
+            with self.subTest(profile=profile):
+                self.assertEqual(self.render(profile)[1], expected)
+
+    def test_inlined_source(self):
+        """Частые включения подставлены в шаблон, включения с only — нет"""
+        template, _ = self.render('inlined')
+        source = template.source
+        self.assertNotIn('include "item.html" with label=item', source)
+        self.assertIn('{% include "item.html" with label="x" only %}', source)
+        self.assertIn('{{ mark }}', source)
+
+    def test_record_templates(self):
+        """Учет рендеринга считает вызовы и время каждого шаблона"""
+        with record_templates() as recorder:
+            self.render('default')
+        report = {row['template']: row for row in recorder.report()}
+        self.assertEqual(report['page.html']['renders'], 1)
+        self.assertEqual(report['item.html']['renders'], 3)
+        self.assertEqual(report['mark.html']['renders'], 3)
+        self.assertGreaterEqual(
+            report['page.html']['total_ms'], report['item.html']['total_ms']
+        )
+        self.assertAlmostEqual(
+            recorder.duration * 1000, report['page.html']['total_ms'],
+            places=2
+        )
+
+    @override_settings(TEMPLATE_TIMING=True)
+    def test_timing_header(self):
+        """С TEMPLATE_TIMING ответ содержит время рендеринга шаблонов"""
+        response = self.client.get('/')
+        self.assertIn('X-Template-Time-Ms', response)
+        self.assertGreater(float(response['X-Template-Time-Ms']), 0)
+
+
+class ContentAddressedStorageTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        self.storage = ContentAddressedStorage(location=self.root)
+
+    def test_name_by_content(self):
+        """Файл хранится под хешем содержимого в каталогах по его началу"""
+        name = self.storage.save('posts/photo.JPG', ContentFile(b'photo'))
+        self.assertEqual(
+            name,
+            'posts/55/c6/55c64d0fcd6f9d5f7c828093857e3fdfda68478bb4e9bd24d481'
+            'ef391c7804e8.jpg'
+        )
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'photo')
+
+    def test_same_content_one_file(self):
+        """Одинаковое содержимое сохраняется один раз без суффиксов"""
+        first = self.storage.save('posts/a.gif', ContentFile(b'same'))
+        second = self.storage.save('posts/b.gif', ContentFile(b'same'))
+        other = self.storage.save('posts/a.gif', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        files = [
+            name for _, _, names in os.walk(self.root) for name in names
+        ]
+        self.assertEqual(len(files), 2)
+
+    def test_immutable_cache_headers(self):
+        """Файлы по хешу отдаются с вечным кешированием"""
+        hashed = self.storage.save('posts/a.gif', ContentFile(b'gif'))
+        with open(os.path.join(self.root, 'plain.gif'), 'wb') as plain:
+            plain.write(b'gif')
+        request = RequestFactory().get('/media/')
+        response = serve_media(request, hashed, document_root=self.root)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        response = serve_media(request, 'plain.gif', document_root=self.root)
+        self.assertNotIn('Cache-Control', response)
+
+
+class FileServerTest(TestCase):
+    CSS = b'body { color: black; }\n' * 200
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.static_root = os.path.join(directory.name, 'static')
+        self.media_root = os.path.join(directory.name, 'media')
+        os.makedirs(os.path.join(self.static_root, 'css'))
+        for name in ('site.css', 'site.0123456789ab.css'):
+            with open(os.path.join(self.static_root, 'css', name), 'wb') as f:
+                f.write(self.CSS)
+        compress_tree(self.static_root)
+        self.media = ContentAddressedStorage(location=self.media_root)
+        self.image = self.media.save('posts/a.webp', ContentFile(b'webp'))
+        settings = override_settings(
+            STATIC_ROOT=self.static_root, MEDIA_ROOT=self.media_root
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        hashed_files = {'css/site.css': 'css/site.0123456789ab.css'}
+        staticfiles_storage._setup()
+        staticfiles_storage.hashed_files = hashed_files
+        self.addCleanup(staticfiles_storage._setup)
+        self.server = FileServer(self.django_application)
+
+    def django_application(self, environ, start_response):
+        start_response('404 Not Found', [])
+        return [b'django']
+
+    def request(self, path, method='GET', **headers):
+        environ = {'REQUEST_METHOD': method, 'PATH_INFO': path, **headers}
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        body = b''.join(self.server(environ, start_response))
+        return response['status'], response['headers'], body
+
+    def test_hashed_static_compressed(self):
+        """Статика с хешем кешируется навсегда и отдается сжатой"""
+        status, headers, body = self.request(
+            '/static/css/site.0123456789ab.css',
+            HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(body), self.CSS)
+        self.assertEqual(int(headers['Content-Length']), len(body))
+
+    def test_unhashed_static_identity(self):
+        """Без хеша — короткий кеш, без gzip в запросе — исходный файл"""
+        status, headers, body = self.request(
+            '/static/css/site.css', HTTP_ACCEPT_ENCODING='gzip;q=0'
+        )
+        self.assertEqual(status, '200 OK')
+        self.assertIn('max-age=3600', headers['Cache-Control'])
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(body, self.CSS)
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304 без тела"""
+        _, headers, _ = self.request('/static/css/site.css')
+        status, _, body = self.request(
+            '/static/css/site.css', HTTP_IF_NONE_MATCH=headers['ETag']
+        )
+        self.assertEqual(status, '304 Not Modified')
+        self.assertEqual(body, b'')
+
+    def test_ranges(self):
+        """Диапазоны байтов отдаются из несжатого файла"""
+        size = len(self.CSS)
+        cases = {
+            'bytes=0-3': ('206 Partial Content', self.CSS[:4]),
+            'bytes=-5': ('206 Partial Content', self.CSS[-5:]),
+            f'bytes={size - 2}-': ('206 Partial Content', self.CSS[-2:]),
+            f'bytes={size}-': ('416 Range Not Satisfiable', b''),
+        }
+        for header, (expected_status, expected_body) in cases.items():
+            with self.subTest(range=header):
+                status, headers, body = self.request(
+                    '/static/css/site.css', HTTP_RANGE=header,
+                    HTTP_ACCEPT_ENCODING='gzip'
+                )
+                self.assertEqual(status, expected_status)
+                self.assertEqual(body, expected_body)
+                self.assertNotIn('Content-Encoding', headers)
+        _, headers, _ = self.request(
+            '/static/css/site.css', HTTP_RANGE='bytes=2-5'
+        )
+        self.assertEqual(headers['Content-Range'], f'bytes 2-5/{size}')
+        status, _, body = self.request(
+            '/static/css/site.css', HTTP_RANGE='bytes=0-1,4-5'
+        )
+        self.assertEqual((status, body), ('200 OK', self.CSS))
+
+    def test_file_wrapper(self):
+        """Тело отдается через wsgi.file_wrapper сервера"""
+        wrapped = []
+
+        def file_wrapper(file, block_size):
+            wrapped.append(file.name)
+            return iter([file.read()])
+
+        _, _, body = self.request(
+            '/static/css/site.css', **{'wsgi.file_wrapper': file_wrapper}
+        )
+        self.assertEqual(body, self.CSS)
+        self.assertEqual(len(wrapped), 1)
+
+    def test_media(self):
+        """Медиа по хешу отдаются с вечным кешем, остальное — в Django"""
+        status, headers, body = self.request('/media/' + self.image)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(headers['Content-Type'], 'image/webp')
+        self.assertEqual(body, b'webp')
+        for path in ('/media/posts/missing.webp', '/media/../static/x'):
+            with self.subTest(path=path):
+                self.assertEqual(self.request(path)[2], b'django')
+        self.assertEqual(
+            self.request('/media/' + self.image, method='POST')[2], b'django'
+        )
+
+
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        # главная страница из кеша не делает запросов и не рендерится
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def profile_settings(self, **options):
+        return override_settings(
+            PROFILE_DIR=self.directory, PROFILE_MAX_SAMPLES=3, **options
+        )
+
+    def test_sampled_requests(self):
+        """Образцы содержат профиль, SQL и шаблоны, старые удаляются"""
+        with self.profile_settings(PROFILE_SAMPLE_RATE=1):
+            for _ in range(4):
+                self.client.get('/about/author/')
+            samples = list(default_store().samples())
+        self.assertEqual(len(samples), 3)
+        for sample in samples:
+            self.assertEqual(sample['view'], 'about:author')
+            self.assertFalse(sample['slow'])
+            self.assertTrue(os.path.exists(sample['profile']))
+        self.assertIn(
+            'about/author.html',
+            [row['template'] for row in samples[0]['templates']]
+        )
+        self.assertEqual(len(os.listdir(self.directory)), 6)
+
+    def test_slow_request_profiles_next(self):
+        """Медленный запрос записывается, следующий к вью профилируется"""
+        with self.profile_settings(PROFILE_SAMPLE_RATE=0, PROFILE_SLOW_MS=0):
+            self.client.get('/')
+            self.client.get('/')
+            first, second = default_store().samples()
+        self.assertTrue(first['slow'])
+        self.assertIsNone(first.get('profile'))
+        self.assertGreater(first['query_count'], 0)
+        self.assertEqual(first['view'], 'posts:index')
+        self.assertTrue(os.path.exists(second['profile']))
+
+    def test_disabled(self):
+        """Без настроек профилирования образцы не пишутся"""
+        with self.profile_settings(PROFILE_SAMPLE_RATE=0):
+            self.client.get('/')
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_report(self):
+        """Отчет складывает образцы и показывает горячие функции"""
+        with self.profile_settings(PROFILE_SAMPLE_RATE=1):
+            self.client.get('/')
+            self.client.get('/about/author/')
+            output = StringIO()
+            call_command('profile_report', stdout=output)
+        report = output.getvalue()
+        self.assertIn('Образцов: 2, с профилем: 2', report)
+        self.assertIn('posts:index: 1 запросов', report)
+        self.assertIn('Функции:', report)
+        self.assertIn('cumulative', report)
@@ -1,4 +1,7 @@
 from django.shortcuts import render
+from django.views.static import serve
+
+from .storage import IMMUTABLE_CACHE_CONTROL, is_hashed
 
 
 def page_not_found(request, exception):
@@ -7,3 +10,11 @@ def page_not_found(request, exception):
 
 def permission_denied(request, exception):
     return render(request, 'core/403csrf.html', status=403)
+
+
+def serve_media(request, path, document_root=None):
+    """Отдает загруженный файл; файлы по хешу кешируются навсегда."""
+    response = serve(request, path, document_root=document_root)
+    if is_hashed(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
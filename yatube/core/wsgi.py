@@ -0,0 +1,243 @@
+"""WSGI-обертка, которая отдает статику и загруженные файлы без Django.
+
+Собранная ``collectstatic`` статика из ``STATIC_ROOT`` индексируется при
+старте: заголовки каждого файла и его сжатые копии ``.br``/``.gz``
+считаются один раз. Файлы из ``MEDIA_ROOT`` ищутся при запросе. Имена
+с хешем (из манифеста статики или из ``core.storage``) отдаются с
+``Cache-Control: immutable``, остальные — с ``UNHASHED_FILES_MAX_AGE``.
+
+Тело ответа отдается через ``wsgi.file_wrapper`` сервера, и gunicorn
+пересылает файл системным ``sendfile`` без копирования в Python.
+Поддерживаются условные запросы и один диапазон байтов в ``Range``;
+диапазон отдается из несжатого файла. Остальные запросы уходят в
+приложение Django.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+from .staticfiles import ENCODINGS
+from .storage import IMMUTABLE_CACHE_CONTROL, is_hashed
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+TEXT_TYPES = ('application/javascript', 'application/json')
+
+
+def _content_type(path):
+    content_type, _ = mimetypes.guess_type(path)
+    content_type = content_type or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type in TEXT_TYPES:
+        content_type += '; charset=utf-8'
+    return content_type
+
+
+def accepted_encodings(header):
+    """Кодировки из ``Accept-Encoding``, кроме запрещенных ``q=0``."""
+    accepted = set()
+    for item in header.split(','):
+        encoding, _, params = item.partition(';')
+        quality = params.strip().partition('q=')[2]
+        try:
+            if quality and float(quality) <= 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+def parse_range(header, size):
+    """Диапазон ``(начало, конец)`` из ``Range``.
+
+    None — диапазон не поддерживается и отдается весь файл, False —
+    диапазон за пределами файла.
+    """
+    match = RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        length = int(last)
+        return (max(size - length, 0), size - 1) if length else False
+    start = int(first)
+    if start >= size:
+        return False
+    end = min(int(last), size - 1) if last else size - 1
+    return (start, end) if start <= end else None
+
+
+def not_modified(environ, etag, mtime):
+    if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        tags = {tag.strip().replace('W/', '', 1)
+                for tag in if_none_match.split(',')}
+        return '*' in tags or etag in tags
+    since = parse_http_date_safe(environ.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return since is not None and int(mtime) <= since
+
+
+def _read(file, length):
+    with file:
+        while length > 0:
+            chunk = file.read(min(BLOCK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+class StaticFile:
+    """Файл, его сжатые копии и общие заголовки ответа."""
+
+    def __init__(self, path, cache_control):
+        stat = os.stat(path)
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+        self.headers = [
+            ('Content-Type', _content_type(path)),
+            ('Last-Modified', http_date(stat.st_mtime)),
+            ('Cache-Control', cache_control),
+            ('Accept-Ranges', 'bytes'),
+        ]
+        self.variants = []
+        for encoding, suffix in ENCODINGS:
+            try:
+                variant = os.stat(path + suffix)
+            except FileNotFoundError:
+                continue
+            if variant.st_mtime >= stat.st_mtime:
+                self.variants.append(
+                    (encoding, path + suffix, variant.st_size)
+                )
+        if self.variants:
+            self.headers.append(('Vary', 'Accept-Encoding'))
+
+    def select(self, accept_encoding):
+        """Копия для клиента: ``(кодировка, путь, размер)``."""
+        accepted = accepted_encodings(accept_encoding)
+        for variant in self.variants:
+            if variant[0] in accepted:
+                return variant
+        return None, self.path, self.size
+
+    def byte_range(self, environ):
+        header = environ.get('HTTP_RANGE')
+        if header is None:
+            return None
+        if_range = environ.get('HTTP_IF_RANGE')
+        if if_range is not None and if_range.strip() != self.etag:
+            return None
+        return parse_range(header, self.size)
+
+
+class FileServer:
+    """Отдает статику и медиа до приложения ``application``."""
+
+    def __init__(self, application):
+        self.application = application
+        self.static_url = settings.STATIC_URL
+        self.media_url = settings.MEDIA_URL
+        self.media_root = settings.MEDIA_ROOT
+        self.files = self.scan(settings.STATIC_ROOT)
+
+    def scan(self, root):
+        if not root or not os.path.isdir(root):
+            return {}
+        hashed = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        suffixes = tuple(suffix for _, suffix in ENCODINGS)
+        files = {}
+        for directory, _, names in os.walk(root):
+            for name in names:
+                if name.endswith(suffixes):
+                    continue
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, root).replace(os.sep, '/')
+                files[self.static_url + relative] = StaticFile(
+                    path, self.cache_control(relative in hashed)
+                )
+        return files
+
+    @staticmethod
+    def cache_control(immutable):
+        if immutable:
+            return IMMUTABLE_CACHE_CONTROL
+        return f'public, max-age={settings.UNHASHED_FILES_MAX_AGE}'
+
+    def find(self, path):
+        found = self.files.get(path)
+        if found is not None or not path.startswith(self.media_url):
+            return found
+        name = path[len(self.media_url):]
+        try:
+            full_path = safe_join(self.media_root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(full_path):
+            return None
+        return StaticFile(full_path, self.cache_control(is_hashed(name)))
+
+    def __call__(self, environ, start_response):
+        if environ['REQUEST_METHOD'] in ('GET', 'HEAD'):
+            try:
+                path = environ.get('PATH_INFO', '').encode(
+                    'iso-8859-1'
+                ).decode()
+            except UnicodeError:
+                path = ''
+            found = self.find(path)
+            if found is not None:
+                return self.serve(found, environ, start_response)
+        return self.application(environ, start_response)
+
+    def serve(self, found, environ, start_response):
+        byte_range = found.byte_range(environ)
+        encoding, path, size = None, found.path, found.size
+        if byte_range is None:
+            encoding, path, size = found.select(
+                environ.get('HTTP_ACCEPT_ENCODING', '')
+            )
+        etag = found.etag
+        headers = list(found.headers)
+        if encoding is not None:
+            etag = f'{etag[:-1]}-{encoding}"'
+            headers.append(('Content-Encoding', encoding))
+        headers.append(('ETag', etag))
+        if not_modified(environ, etag, found.mtime):
+            start_response('304 Not Modified', headers)
+            return []
+        if byte_range is False:
+            headers.append(('Content-Range', f'bytes */{size}'))
+            start_response('416 Range Not Satisfiable', headers)
+            return []
+        status, start, length = '200 OK', 0, size
+        if byte_range:
+            start, end = byte_range
+            status, length = '206 Partial Content', end - start + 1
+            headers.append(('Content-Range', f'bytes {start}-{end}/{size}'))
+        headers.append(('Content-Length', str(length)))
+        start_response(status, headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        return self.body(environ, path, start, length, size)
+
+    @staticmethod
+    def body(environ, path, start, length, size):
+        file = open(path, 'rb')
+        file.seek(start)
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        # обертка сервера читает до конца файла, поэтому диапазон из
+        # середины отдается по кускам
+        if file_wrapper is not None and start + length == size:
+            return file_wrapper(file, BLOCK_SIZE)
+        return _read(file, length)
@@ -0,0 +1,32 @@
+"""Отправка писем через очередь задач.
+
+``QueuedEmailBackend`` только ставит письмо в очередь, поэтому
+``PasswordResetView`` и другие вью не ждут почтовый сервер. Воркер
+отправляет письмо через ``JOBS_EMAIL_BACKEND``.
+"""
+import base64
+import copy
+import pickle
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .queue import task
+
+
+@task(priority=20)
+def send_message(data):
+    message = pickle.loads(base64.b64decode(data))
+    get_connection(settings.JOBS_EMAIL_BACKEND).send_messages([message])
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            message = copy.copy(message)
+            message.connection = None
+            send_message.delay(
+                base64.b64encode(pickle.dumps(message)).decode()
+            )
+        return len(email_messages)
@@ -0,0 +1,92 @@
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs import queue
+
+
+def _init_process():
+    if not apps.ready:
+        django.setup()
+
+
+def _run(job_id):
+    try:
+        return queue.run(job_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в пуле процессов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.JOBS_CONCURRENCY,
+            help='Число процессов, 0 — выполнять в текущем процессе'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Завершиться, когда очередь опустеет'
+        )
+        parser.add_argument(
+            '--poll', type=float, default=settings.JOBS_POLL_INTERVAL,
+            help='Пауза между опросами пустой очереди в секундах'
+        )
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        if options['concurrency'] <= 0:
+            processed = self.run_inline(options)
+        else:
+            processed = self.run_pool(options)
+        self.stdout.write(f'Выполнено задач: {processed}')
+
+    def run_inline(self, options):
+        processed = 0
+        while not self.stopping:
+            queue.requeue_stale()
+            done = queue.run_pending(limit=1)
+            processed += done
+            if not done:
+                if options['burst']:
+                    break
+                time.sleep(options['poll'])
+        return processed
+
+    def run_pool(self, options):
+        concurrency = options['concurrency']
+        processed = 0
+        running = set()
+        # дочерние процессы не должны получить открытые соединения
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=concurrency, initializer=_init_process
+        ) as pool:
+            while not self.stopping or running:
+                if not self.stopping:
+                    queue.requeue_stale()
+                    for job_id in queue.claim(concurrency - len(running)):
+                        running.add(pool.submit(_run, job_id))
+                if not running:
+                    if options['burst']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+                done, running = wait(
+                    running, timeout=options['poll'],
+                    return_when=FIRST_COMPLETED
+                )
+                processed += len(done)
+        return processed
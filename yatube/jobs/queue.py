@@ -0,0 +1,150 @@
+"""Очередь фоновых задач в таблице ``Job``.
+
+Задача — функция, помеченная ``@task``. Вызов ``func.delay(...)``
+записывает строку в текущей транзакции, поэтому воркер увидит задачу
+только вместе с данными, ради которых она поставлена. ``runworker``
+забирает задачи пачками по приоритету и выполняет их в пуле процессов.
+Упавшая задача возвращается в очередь с экспоненциальной задержкой,
+после ``max_attempts`` попыток остается в состоянии ``failed``.
+
+С ``JOBS_EAGER`` задачи выполняются сразу при постановке, как раньше
+выполнялась вся работа в запросе.
+"""
+import json
+import logging
+import os
+import random
+import socket
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(name, args=(), kwargs=None, priority=0, key='',
+            max_attempts=None, delay=0):
+    """Ставит вызов функции ``name`` в очередь, возвращает задачу.
+
+    Если задача с тем же непустым ``key`` уже ждет очереди, новая не
+    создается и возвращается None.
+    """
+    if key and Job.objects.filter(key=key, status=Job.QUEUED).exists():
+        return None
+    return Job.objects.create(
+        name=name,
+        payload=json.dumps({'args': list(args), 'kwargs': kwargs or {}}),
+        priority=priority,
+        key=key,
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def task(priority=0, key=None, max_attempts=None):
+    """Добавляет функции метод ``delay`` для вызова через очередь.
+
+    ``key`` — функция от аргументов вызова, возвращающая ключ повторов.
+    """
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        def delay(*args, **kwargs):
+            if settings.JOBS_EAGER:
+                func(*args, **kwargs)
+                return None
+            return enqueue(
+                name, args, kwargs, priority=priority,
+                key=key(*args, **kwargs) if key else '',
+                max_attempts=max_attempts,
+            )
+        func.delay = delay
+        return func
+    return decorator
+
+
+def backoff(attempts):
+    """Задержка перед следующей попыткой в секундах."""
+    base = settings.JOBS_RETRY_DELAY
+    return base * 2 ** (attempts - 1) + random.uniform(0, base)
+
+
+def claim(limit):
+    """Забирает до ``limit`` готовых задач, возвращает их id."""
+    if limit <= 0:
+        return []
+    token = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+    now = timezone.now()
+    ready = Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=now
+    ).order_by('-priority', 'run_at', 'id').values('id')[:limit]
+    # один UPDATE: в SQLite чтение и запись в одной транзакции упираются
+    # в блокировку, а условие на статус не даст забрать задачу дважды
+    Job.objects.filter(id__in=ready, status=Job.QUEUED).update(
+        status=Job.RUNNING, locked_by=token, locked_at=now,
+        attempts=F('attempts') + 1,
+    )
+    return list(
+        Job.objects.filter(
+            locked_by=token, status=Job.RUNNING
+        ).order_by('-priority', 'run_at', 'id').values_list('id', flat=True)
+    )
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи воркеров, которые не ответили."""
+    deadline = timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=deadline
+    ).update(status=Job.QUEUED, locked_by='', locked_at=None)
+
+
+def _failed(job, error):
+    job.last_error = error
+    job.locked_by = ''
+    job.locked_at = None
+    if job.attempts >= job.max_attempts:
+        job.status = Job.FAILED
+    else:
+        job.status = Job.QUEUED
+        job.run_at = timezone.now() + timedelta(
+            seconds=backoff(job.attempts)
+        )
+    job.save(update_fields=[
+        'last_error', 'locked_by', 'locked_at', 'status', 'run_at'
+    ])
+
+
+def run(job_id):
+    """Выполняет забранную задачу; успешная задача удаляется."""
+    job = Job.objects.filter(pk=job_id, status=Job.RUNNING).first()
+    if job is None:
+        return False
+    try:
+        payload = json.loads(job.payload)
+        import_string(job.name)(*payload['args'], **payload['kwargs'])
+    except Exception:
+        logger.exception('Задача %s #%s не выполнена', job.name, job.pk)
+        _failed(job, traceback.format_exc())
+        return False
+    job.delete()
+    return True
+
+
+def run_pending(limit=None):
+    """Выполняет готовые задачи в текущем процессе, возвращает их число."""
+    processed = 0
+    while limit is None or processed < limit:
+        ids = claim(1)
+        if not ids:
+            break
+        run(ids[0])
+        processed += 1
+    return processed
@@ -0,0 +1,84 @@
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from . import queue
+from .mail import QueuedEmailBackend
+from .models import Job
+
+calls = []
+
+
+@queue.task(key=lambda value: f'record:{value}')
+def record(value):
+    calls.append(value)
+
+
+@queue.task(max_attempts=2)
+def explode():
+    raise RuntimeError('Ошибка задачи')
+
+
+class QueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_priorities_and_keys(self):
+        """Задачи выполняются по приоритету, повторы по ключу не ставятся"""
+        queue.enqueue(f'{__name__}.record', ['low'])
+        queue.enqueue(f'{__name__}.record', ['high'], priority=5)
+        record.delay('keyed')
+        self.assertIsNone(record.delay('keyed'))
+        self.assertEqual(Job.objects.count(), 3)
+        call_command(
+            'runworker', '--burst', '--concurrency', '0', stdout=StringIO()
+        )
+        self.assertEqual(calls, ['high', 'low', 'keyed'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_retries_with_backoff(self):
+        """Упавшая задача повторяется с задержкой до предела попыток"""
+        job = explode.delay()
+        self.assertEqual(queue.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_at, job.created)
+        self.assertIn('Ошибка задачи', job.last_error)
+        self.assertEqual(queue.run_pending(), 0)
+        Job.objects.filter(pk=job.pk).update(run_at=job.created)
+        self.assertEqual(queue.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_stale_jobs_requeued(self):
+        """Задачи зависшего воркера возвращаются в очередь"""
+        record.delay('stale')
+        queue.claim(1)
+        with self.settings(JOBS_LOCK_TIMEOUT=-1):
+            self.assertEqual(queue.requeue_stale(), 1)
+        self.assertEqual(queue.run_pending(), 1)
+        self.assertEqual(calls, ['stale'])
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager(self):
+        """С JOBS_EAGER задача выполняется сразу"""
+        self.assertIsNone(record.delay('now'))
+        self.assertEqual(calls, ['now'])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(
+        JOBS_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'
+    )
+    def test_queued_email(self):
+        """Письмо отправляется воркером, а не в запросе"""
+        mail.EmailMessage(
+            'Тема', 'Текст', 'from@example.com', ['to@example.com'],
+            connection=QueuedEmailBackend()
+        ).send()
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(queue.run_pending(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Тема')
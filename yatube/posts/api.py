@@ -0,0 +1,154 @@
+"""JSON API лент для мобильного клиента.
+
+Посты читаются проекцией ``values()`` без создания моделей и отдаются
+страницами по курсору. ETag строится по версиям лент из ``caching``, так
+что повторный запрос с ``If-None-Match`` получает 304 без обращения к
+базе данных.
+"""
+import json
+from functools import wraps
+
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_GET
+
+from core.storage import content_storage
+
+from . import caching, feed
+from .models import Comment, Group, Post, User
+from .utils import COMMENTS_ORDERING, CursorPaginator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'image', 'comments_count',
+    'author__username', 'author__first_name', 'author__last_name',
+    'group__slug', 'group__title',
+)
+COMMENT_FIELDS = (
+    'id', 'text', 'created',
+    'author__username', 'author__first_name', 'author__last_name',
+)
+PAGE_SIZE = 20
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(
+        data, ensure_ascii=False, separators=(',', ':')
+    ).encode()
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        dumps(data), status=status, content_type='application/json'
+    )
+
+
+def _author(row):
+    name = f"{row['author__first_name']} {row['author__last_name']}"
+    return {'username': row['author__username'], 'name': name.strip()}
+
+
+def serialize_post(row):
+    group = None
+    if row['group__slug']:
+        group = {'slug': row['group__slug'], 'title': row['group__title']}
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'pub_date': row['pub_date'].isoformat(),
+        'image': content_storage.url(row['image']) if row['image'] else None,
+        'comments': row['comments_count'],
+        'author': _author(row),
+        'group': group,
+    }
+
+
+def serialize_comment(row):
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'created': row['created'].isoformat(),
+        'author': _author(row),
+    }
+
+
+def cursor_page(request, rows, ordering=None):
+    kwargs = {'ordering': ordering} if ordering else {}
+    paginator = CursorPaginator(rows, PAGE_SIZE, **kwargs)
+    return paginator.cursor_page(request.GET.get(paginator.cursor_param))
+
+
+def feed_response(request, posts):
+    page = cursor_page(request, posts.values(*POST_FIELDS))
+    return json_response({
+        'results': [serialize_post(row) for row in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+def api_view(scopes, login_required=False):
+    """GET-вью API с ETag по версиям лент ``scopes(request, **kwargs)``."""
+    def decorator(view):
+        conditional = condition(
+            etag_func=lambda request, *args, **kwargs: caching.etag(
+                request, scopes(request, **kwargs)
+            )
+        )(view)
+
+        @require_GET
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if login_required and not request.user.is_authenticated:
+                return json_response({'detail': 'Требуется вход'}, 401)
+            return conditional(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@api_view(lambda request: [caching.GLOBAL])
+def index(request):
+    return feed_response(request, Post.objects.all())
+
+
+@api_view(lambda request, slug: [caching.group_scope(slug)])
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('id'), slug=slug)
+    return feed_response(request, Post.objects.filter(group=group))
+
+
+@api_view(lambda request, username: [caching.author_scope(username)])
+def profile(request, username):
+    author = get_object_or_404(User.objects.only('id'), username=username)
+    return feed_response(request, Post.objects.filter(author=author))
+
+
+@api_view(
+    lambda request: [caching.GLOBAL, caching.follow_scope(request.user.pk)],
+    login_required=True
+)
+def follow_index(request):
+    return feed_response(request, feed.timeline(request.user))
+
+
+@api_view(lambda request, post_id: [caching.post_scope(post_id)])
+def post_detail(request, post_id):
+    post = get_object_or_404(
+        Post.objects.values(*POST_FIELDS), id=post_id
+    )
+    comments = cursor_page(
+        request,
+        Comment.objects.filter(post_id=post_id).values(*COMMENT_FIELDS),
+        ordering=COMMENTS_ORDERING,
+    )
+    return json_response({
+        'post': serialize_post(post),
+        'comments': [serialize_comment(row) for row in comments],
+        'next': comments.next_cursor,
+    })
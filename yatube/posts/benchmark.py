@@ -0,0 +1,255 @@
+"""Нагрузочный прогон страниц постов на синтетических данных.
+
+Данные заполняются через ``bulk_create``: авторы и группы выбираются по
+закону Ципфа, поэтому у нескольких авторов много подписчиков и постов, а у
+большинства — единицы. Тексты берутся из заранее сгенерированного Faker
+набора абзацев. Страницы запрашиваются через тестовый клиент Django,
+для каждой считаются перцентили времени ответа, время рендеринга шаблонов
+и число SQL-запросов.
+"""
+import copy
+import math
+import random
+import resource
+import time
+from datetime import timedelta
+from io import StringIO
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+
+from core.instrumentation import record_queries, record_templates
+from core.template_loaders import profile_loaders
+
+from .models import Comment, Follow, Group, Post, UserStats
+from .transfer import keep_auto_now_add
+
+User = get_user_model()
+
+SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+POSTS_PER_USER = 20
+POSTS_PER_GROUP = 2_000
+GROUPED_SHARE = 0.6
+COMMENTS_PER_POST = 0.3
+MAX_FOLLOWS = 50
+POPULARITY = 1.1
+TEXTS = 500
+TIME_SPAN = 365 * 24 * 60 * 60
+BATCH_SIZE = 5_000
+PERCENTILES = (50, 95, 99)
+
+
+def _zipf_weights(count):
+    """Накопленные веса для ``random.choices``: первый популярнее всех."""
+    return list(accumulate(1 / (rank + 1) ** POPULARITY
+                           for rank in range(count)))
+
+
+def _batched(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _seed_users(total, fake, rng):
+    password = make_password(None)
+    for batch in _batched(range(total)):
+        User.objects.bulk_create([
+            User(
+                username=f'user{number}',
+                first_name=fake.first_name(),
+                last_name=fake.last_name(),
+                password=password,
+            )
+            for number in batch
+        ])
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    rng.shuffle(user_ids)
+    return user_ids
+
+
+def _seed_groups(total, fake):
+    Group.objects.bulk_create([
+        Group(
+            title=fake.catch_phrase()[:200],
+            slug=f'group-{number}',
+            description=fake.paragraph(),
+        )
+        for number in range(total)
+    ])
+    return list(Group.objects.values_list('pk', flat=True))
+
+
+def _seed_posts(total, user_ids, group_ids, texts, rng):
+    weights = _zipf_weights(len(user_ids))
+    now = timezone.now()
+    for batch in _batched(range(total)):
+        authors = rng.choices(user_ids, cum_weights=weights, k=len(batch))
+        Post.objects.bulk_create([
+            Post(
+                text=rng.choice(texts),
+                author_id=author_id,
+                group_id=(
+                    rng.choice(group_ids)
+                    if rng.random() < GROUPED_SHARE else None
+                ),
+                pub_date=now - timedelta(seconds=rng.randrange(TIME_SPAN)),
+            )
+            for author_id in authors
+        ])
+
+
+def _seed_comments(total, user_ids, texts, rng):
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    now = timezone.now()
+    for batch in _batched(range(total)):
+        Comment.objects.bulk_create([
+            Comment(
+                post_id=rng.choice(post_ids),
+                author_id=rng.choice(user_ids),
+                text=rng.choice(texts)[:200],
+                created=now - timedelta(seconds=rng.randrange(TIME_SPAN)),
+            )
+            for _ in batch
+        ])
+
+
+def _seed_follows(user_ids, rng):
+    weights = _zipf_weights(len(user_ids))
+    follows = []
+    for user_id in user_ids:
+        wanted = rng.randint(0, min(MAX_FOLLOWS, len(user_ids) - 1))
+        authors = set(
+            rng.choices(user_ids, cum_weights=weights, k=wanted)
+        )
+        authors.discard(user_id)
+        follows.extend(
+            Follow(user_id=user_id, author_id=author_id)
+            for author_id in authors
+        )
+        if len(follows) >= BATCH_SIZE:
+            Follow.objects.bulk_create(follows, ignore_conflicts=True)
+            follows = []
+    Follow.objects.bulk_create(follows, ignore_conflicts=True)
+
+
+def seed(posts, random_seed=0):
+    """Заполняет пустую базу данными заданного масштаба."""
+    rng = random.Random(random_seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(random_seed)
+    texts = [fake.paragraph(nb_sentences=4) for _ in range(TEXTS)]
+    with keep_auto_now_add(
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ):
+        user_ids = _seed_users(max(posts // POSTS_PER_USER, 10), fake, rng)
+        group_ids = _seed_groups(max(posts // POSTS_PER_GROUP, 3), fake)
+        _seed_posts(posts, user_ids, group_ids, texts, rng)
+        _seed_comments(int(posts * COMMENTS_PER_POST), user_ids, texts, rng)
+        _seed_follows(user_ids, rng)
+    # bulk_create не отправляет сигналы моделей
+    call_command('reconcile_counters', stdout=StringIO())
+    call_command('rebuild_feeds', stdout=StringIO())
+    cache.clear()
+    return {
+        'users': User.objects.count(),
+        'groups': Group.objects.count(),
+        'posts': Post.objects.count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+    }
+
+
+def targets():
+    """Читатель и адреса страниц с самыми тяжелыми данными."""
+    reader = UserStats.objects.order_by('-following_count').first().user
+    author = UserStats.objects.order_by('-followers_count').first().user
+    group = Group.objects.order_by('-posts_count').first()
+    post = Post.objects.filter(author=author).order_by(
+        '-comments_count'
+    ).first() or Post.objects.order_by('-comments_count').first()
+    return reader, (
+        ('posts:index', {}),
+        ('posts:group', {'slug': group.slug}),
+        ('posts:profile', {'username': author.username}),
+        ('posts:post_detail', {'post_id': post.pk}),
+        ('posts:follow_index', {}),
+    )
+
+
+def percentile(values, q):
+    """Перцентиль с линейной интерполяцией между соседними значениями."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (
+        ordered[upper] - ordered[lower]
+    ) * (position - lower)
+
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def template_settings(profile):
+    """Настройка TEMPLATES для профиля загрузчиков шаблонов."""
+    templates = copy.deepcopy(settings.TEMPLATES)
+    # без явных loaders Django сам включает кеш при DEBUG = False
+    templates[0]['APP_DIRS'] = False
+    templates[0]['OPTIONS']['loaders'] = profile_loaders(
+        profile, settings.TEMPLATE_INLINE_INCLUDES
+    )
+    return templates
+
+
+def measure(client, url, requests, cold=False):
+    """Время ответа, шаблонов и число запросов для одной страницы."""
+    client.get(url)
+    timings = []
+    renders = []
+    queries = []
+    for _ in range(requests):
+        if cold:
+            cache.clear()
+        with record_queries() as recorder, record_templates() as templates:
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url}: ответ {response.status_code}')
+        queries.append(recorder.count)
+        renders.append(templates.duration * 1000)
+    report = {
+        f'p{q}_ms': round(percentile(timings, q), 3) for q in PERCENTILES
+    }
+    report['mean_ms'] = round(sum(timings) / len(timings), 3)
+    report['template_p50_ms'] = round(percentile(renders, 50), 3)
+    report['queries'] = max(queries)
+    return report
+
+
+def run(requests):
+    """Прогоняет все страницы с холодным и прогретым кешем."""
+    reader, pages = targets()
+    client = Client(SERVER_NAME='localhost', REMOTE_ADDR='10.0.0.1')
+    client.force_login(reader)
+    results = []
+    for name, kwargs in pages:
+        url = reverse(name, kwargs=kwargs)
+        results.append({
+            'name': name,
+            'url': url,
+            'requests': requests,
+            'cold': measure(client, url, requests, cold=True),
+            'warm': measure(client, url, requests),
+        })
+    return results
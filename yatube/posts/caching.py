@@ -0,0 +1,158 @@
+"""Кеширование страниц лент с версионными ключами.
+
+Каждая лента (общая, группы, автора, пост) имеет версию в кеше.
+Сигналы моделей меняют версию при изменении данных, поэтому страницы
+хранятся долго и обновляются сразу после изменений. Устаревшую страницу
+пересчитывает только один запрос, остальные в это время получают
+прежнюю версию (stale-while-revalidate).
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.views.decorators.http import condition
+
+from core import db
+
+GLOBAL = 'global'
+SUGGESTIONS = 'suggestions'
+TRENDING = 'trending'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def follow_scope(user_id):
+    return f'follow:{user_id}'
+
+
+def followers_scope(author_id):
+    return f'followers:{author_id}'
+
+
+def _version_key(scope):
+    return 'feed_version:' + hashlib.md5(scope.encode()).hexdigest()
+
+
+def _new_version():
+    return f'{time.time_ns():x}'
+
+
+def versions(scopes):
+    """Текущие версии лент; отсутствующие версии создаются."""
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_version(), None)
+        found.update(cache.get_many(missing))
+    return tuple(found.get(key) for key in keys)
+
+
+def bump(*scopes):
+    """Инвалидирует все закешированные страницы перечисленных лент."""
+    version = _new_version()
+    cache.set_many({_version_key(scope): version for scope in scopes}, None)
+
+
+def _request_fingerprint(request):
+    user_id = request.user.pk if request.user.is_authenticated else ''
+    return f'{request.get_full_path()}:{user_id}'
+
+
+def _page_key(request):
+    raw = _request_fingerprint(request)
+    return 'feed_page:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def etag(request, scopes):
+    """ETag ответа по версиям лент, адресу и пользователю."""
+    raw = ':'.join([*versions(scopes), _request_fingerprint(request)])
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _from_entry(entry):
+    _, content, content_type = entry
+    return HttpResponse(content, content_type=content_type)
+
+
+def cached_response(request, scopes, render):
+    current = versions(scopes)
+    key = _page_key(request)
+    entry = cache.get(key)
+    if entry is not None and entry[0] == current:
+        return _from_entry(entry)
+    lock_key = key + ':lock'
+    locked = False
+    if entry is not None:
+        locked = cache.add(lock_key, 1, settings.FEED_CACHE_LOCK_TIMEOUT)
+        if not locked:
+            return _from_entry(entry)
+    try:
+        # реплика может отставать от новой версии ленты, а страница
+        # хранится под этой версией до следующего изменения
+        with db.primary():
+            response = render()
+        if response.status_code == 200 and not response.streaming:
+            cache.set(
+                key,
+                (current, response.content, response['Content-Type']),
+                settings.FEED_CACHE_TIMEOUT
+            )
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return response
+
+
+def _scope_names(scopes, request, kwargs):
+    names = scopes(request, **kwargs) if callable(scopes) else scopes
+    if isinstance(names, str):
+        return [names]
+    return names
+
+
+def cache_feed(scopes):
+    """Кеширует GET-ответы вью до изменения версий лент.
+
+    ``scopes`` — имя ленты или функция ``(request, **kwargs)``,
+    возвращающая имя или список имен.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+            return cached_response(
+                request, _scope_names(scopes, request, kwargs),
+                lambda: view(request, *args, **kwargs)
+            )
+        return wrapper
+    return decorator
+
+
+def conditional_feed(scopes):
+    """Отвечает 304 на If-None-Match, пока версии лент не изменились.
+
+    ``scopes`` — как у ``cache_feed``, функция может вернуть None,
+    если ETag не нужен.
+    """
+    def etag_func(request, *args, **kwargs):
+        names = _scope_names(scopes, request, kwargs)
+        if names is None:
+            return None
+        return etag(request, names)
+    return condition(etag_func=etag_func)
@@ -0,0 +1,35 @@
+"""Кеш отрендеренных карточек постов.
+
+Ключ карточки содержит id поста и время его изменения ``updated``,
+поэтому правка поста сама делает прежнюю карточку недоступной. Карточки
+страницы читаются из кеша одним ``get_many``, недостающие рендерятся и
+записываются одним ``set_many``.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+TEMPLATE = 'posts/includes/post_list.html'
+
+
+def card_key(post):
+    return f'post_card:{post.pk}:{post.updated.timestamp():.6f}'
+
+
+def attach(posts):
+    """Добавляет постам атрибут ``card`` с HTML карточки."""
+    posts = {card_key(post): post for post in posts}
+    found = cache.get_many(list(posts))
+    rendered = {}
+    for key, post in posts.items():
+        html = found.get(key)
+        if html is None:
+            html = rendered[key] = render_to_string(TEMPLATE, {'post': post})
+        post.card = mark_safe(html)
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_TIMEOUT)
+
+
+def forget(post):
+    cache.delete(card_key(post))
@@ -0,0 +1,91 @@
+"""Денормализованные счетчики постов, комментариев и подписок.
+
+Счетчики меняются атомарными ``UPDATE ... SET field = field + 1``,
+поэтому страницы не выполняют ``COUNT(*)`` при каждом показе.
+"""
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Comment, Follow, Group, Post, UserStats
+
+
+def _shift(queryset, field, delta):
+    return queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def change_group(group_id, delta):
+    if group_id:
+        _shift(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def change_post(post_id, delta):
+    _shift(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def change_user(user_id, field, delta):
+    _shift(UserStats.objects.filter(pk=user_id), field, delta)
+
+
+def change_users(user_ids, field, delta):
+    _shift(UserStats.objects.filter(pk__in=user_ids), field, delta)
+
+
+def _totals(queryset, field, ids):
+    return dict(
+        queryset.filter(**{f'{field}__in': ids}).order_by()
+        .values_list(field).annotate(total=Count('pk'))
+    )
+
+
+def recount_users(user_ids):
+    """Пересчитывает счетчики пользователей по данным таблиц."""
+    user_ids = list(user_ids)
+    posts = _totals(Post.objects, 'author', user_ids)
+    followers = _totals(Follow.objects, 'author', user_ids)
+    following = _totals(Follow.objects, 'user', user_ids)
+    stats = [
+        UserStats(
+            user_id=user_id,
+            posts_count=posts.get(user_id, 0),
+            followers_count=followers.get(user_id, 0),
+            following_count=following.get(user_id, 0),
+        )
+        for user_id in user_ids
+    ]
+    existing = set(
+        UserStats.objects.filter(
+            pk__in=user_ids
+        ).values_list('pk', flat=True)
+    )
+    UserStats.objects.bulk_create(
+        [item for item in stats if item.pk not in existing],
+        ignore_conflicts=True
+    )
+    UserStats.objects.bulk_update(
+        [item for item in stats if item.pk in existing],
+        ['posts_count', 'followers_count', 'following_count']
+    )
+
+
+def recount_groups(group_ids):
+    group_ids = list(group_ids)
+    posts = _totals(Post.objects, 'group', group_ids)
+    Group.objects.bulk_update(
+        [
+            Group(pk=group_id, posts_count=posts.get(group_id, 0))
+            for group_id in group_ids
+        ],
+        ['posts_count']
+    )
+
+
+def recount_posts(post_ids):
+    post_ids = list(post_ids)
+    comments = _totals(Comment.objects, 'post', post_ids)
+    Post.objects.bulk_update(
+        [
+            Post(pk=post_id, comments_count=comments.get(post_id, 0))
+            for post_id in post_ids
+        ],
+        ['comments_count']
+    )
@@ -0,0 +1,137 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост автора раскладывается в ленты его подписчиков заранее, поэтому
+``follow_index`` читает только записи ``FeedEntry`` одного пользователя.
+Посты авторов с очень большим числом подписчиков в ленты не раскладываются
+и подмешиваются при чтении (fan-out on read).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+
+from .models import FeedEntry, Follow, Post, UserStats
+
+CELEBRITIES_KEY = 'feed:celebrities'
+BATCH_SIZE = 500
+
+
+def celebrities():
+    """Авторы, посты которых собираются в ленту при чтении."""
+    def compute():
+        return frozenset(
+            UserStats.objects.filter(
+                followers_count__gte=settings.FEED_FANOUT_LIMIT
+            ).values_list('user_id', flat=True)
+        )
+    return cache.get_or_set(
+        CELEBRITIES_KEY, compute, settings.FEED_CELEBRITIES_TIMEOUT
+    )
+
+
+def trim(user_ids):
+    """Оставляет в лентах пользователей не более FEED_MAX_LENGTH записей."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    table = connection.ops.quote_name(FeedEntry._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN ('
+            f'SELECT id FROM (SELECT id, ROW_NUMBER() OVER ('
+            f'PARTITION BY user_id ORDER BY pub_date DESC, id DESC) AS rn '
+            f'FROM {table} WHERE user_id IN ({placeholders})) ranked '
+            f'WHERE rn > %s)',
+            [*user_ids, settings.FEED_MAX_LENGTH]
+        )
+
+
+def _insert(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def push_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if post.author_id in celebrities():
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).iterator()
+    batch = []
+    for user_id in follower_ids:
+        batch.append(user_id)
+        if len(batch) >= BATCH_SIZE:
+            _push_batch(post, batch)
+            batch = []
+    _push_batch(post, batch)
+
+
+def _push_batch(post, user_ids):
+    _insert(
+        FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in user_ids
+    )
+    trim(user_ids)
+
+
+def add_author(user_id, author_id):
+    add_authors(user_id, [author_id])
+
+
+def add_authors(user_id, author_ids):
+    """Переносит свежие посты авторов в ленту нового подписчика."""
+    author_ids = set(author_ids) - celebrities()
+    if not author_ids:
+        return
+    posts = Post.objects.filter(author_id__in=author_ids).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:settings.FEED_MAX_LENGTH]
+    _insert(
+        FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts
+    )
+    trim([user_id])
+
+
+def remove_author(user_id, author_id):
+    remove_authors(user_id, [author_id])
+
+
+def remove_authors(user_id, author_ids):
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id__in=author_ids
+    ).delete()
+
+
+def rebuild(user_id):
+    """Пересобирает ленту пользователя из его подписок."""
+    FeedEntry.objects.filter(user_id=user_id).delete()
+    posts = Post.objects.filter(
+        author__following__user_id=user_id
+    ).exclude(
+        author_id__in=celebrities()
+    ).order_by('-pub_date', '-id').values_list(
+        'id', 'pub_date'
+    )[:settings.FEED_MAX_LENGTH]
+    _insert(
+        FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts
+    )
+
+
+def timeline(user):
+    """Посты ленты подписок пользователя."""
+    followed_celebrities = list(
+        Follow.objects.filter(
+            user=user, author_id__in=celebrities()
+        ).values_list('author_id', flat=True)
+    )
+    if not followed_celebrities:
+        return Post.objects.filter(feed_entries__user=user)
+    return Post.objects.filter(
+        Q(id__in=FeedEntry.objects.filter(user=user).values('post_id'))
+        | Q(author_id__in=followed_celebrities)
+    )
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Post, Comment
 
 
@@ -17,6 +19,12 @@ class PostForm(forms.ModelForm):
             'group': ('Выберить группу для поста'),
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return images.process(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,111 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс ``posts_post_fts`` — внешняя FTS5-таблица над ``posts_post``.
+Триггеры поддерживают ее в актуальном состоянии при любой записи в
+таблицу постов, в том числе при ``bulk_create``. Django пересоздает
+таблицу SQLite при части миграций и теряет ее триггеры, поэтому индекс
+устанавливается идемпотентно после каждого ``migrate``.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+TOKEN = re.compile(r'\w+')
+MAX_TERMS = 10
+
+INSTALL_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"text, content='posts_post', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert "
+    f"AFTER INSERT ON posts_post BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete "
+    f"AFTER DELETE ON posts_post BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) "
+    f"VALUES ('delete', old.id, old.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update "
+    f"AFTER UPDATE OF text ON posts_post BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) "
+    f"VALUES ('delete', old.id, old.text); "
+    f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END",
+)
+
+
+def is_supported(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection):
+    """Создает FTS-таблицу и триггеры, если их нет."""
+    if not is_supported(using):
+        return False
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [FTS_TABLE]
+        )
+        created = cursor.fetchone() is None
+        for sql in INSTALL_SQL:
+            cursor.execute(sql)
+    if created:
+        rebuild(using)
+    return True
+
+
+def rebuild(using=connection):
+    """Перестраивает индекс по текущему содержимому posts_post."""
+    with using.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def match_expression(query):
+    """Безопасное выражение MATCH: все слова запроса как префиксы."""
+    terms = TOKEN.findall(query.lower())[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def ranked_ids(query, limit=None):
+    """Id постов по убыванию релевантности."""
+    limit = limit or settings.SEARCH_MAX_RESULTS
+    expression = match_expression(query)
+    if not expression:
+        return []
+    if not is_supported():
+        return list(
+            Post.objects.filter(text__icontains=query.strip())
+            .order_by('-pub_date', '-id')
+            .values_list('id', flat=True)[:limit]
+        )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY rank LIMIT %s',
+            [expression, limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class SearchResults:
+    """Ленивая последовательность постов по списку id для Paginator."""
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        ids = self.ids[index]
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
+
+
+def search(query):
+    return SearchResults(ranked_ids(query))
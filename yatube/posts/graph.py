@@ -0,0 +1,186 @@
+"""Граф подписок поверх модели ``Follow``.
+
+Уникальный индекс (user, author) и индекс (author, user) служат списками
+смежности в обе стороны: подписки и подписчики читаются без обращения к
+самой таблице. Множества смежности держатся в LRU процесса вместе с
+версией ленты из ``caching``. Изменение подписок меняет версию, поэтому
+другие процессы видят изменение при следующем чтении.
+
+Массовая подписка выполняет работу сигналов ``Follow`` сразу для всех
+пар: счетчики, ленты и версии меняются несколькими запросами. Отписка
+удаляет подписки через ``QuerySet.delete()``, и ту же работу делают
+сигналы. Сигналы и массовая подписка вызывают общий ``changed``.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import caching, counters, feed, suggestions
+from .models import Follow, User, UserStats
+
+FOLLOWING = 'following'
+FOLLOWERS = 'followers'
+
+
+class LRU:
+    def __init__(self, size):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+adjacency = LRU(settings.FOLLOW_GRAPH_CACHE_SIZE)
+
+
+def _scope(direction, node_id):
+    if direction == FOLLOWING:
+        return caching.follow_scope(node_id)
+    return caching.followers_scope(node_id)
+
+
+def _neighbours(direction, node_id):
+    if direction == FOLLOWING:
+        rows = Follow.objects.filter(user_id=node_id).values_list(
+            'author_id', flat=True
+        )
+    else:
+        rows = Follow.objects.filter(author_id=node_id).values_list(
+            'user_id', flat=True
+        )
+    return frozenset(rows.order_by())
+
+
+def _adjacent(direction, node_id):
+    version, = caching.versions([_scope(direction, node_id)])
+    key = (direction, node_id)
+    entry = adjacency.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    nodes = _neighbours(direction, node_id)
+    # подписчиков популярного автора держать в памяти процесса дорого
+    if len(nodes) <= settings.FOLLOW_GRAPH_MAX_SET:
+        adjacency.set(key, (version, nodes))
+    return nodes
+
+
+def following(user_id):
+    """Id авторов, на которых подписан пользователь."""
+    return _adjacent(FOLLOWING, user_id)
+
+
+def followers(author_id):
+    """Id подписчиков автора."""
+    return _adjacent(FOLLOWERS, author_id)
+
+
+def followed_among(user_id, author_ids):
+    """Авторы из ``author_ids``, на которых подписан пользователь."""
+    return following(user_id) & set(author_ids)
+
+
+def is_following(user_id, author_id):
+    return author_id in following(user_id)
+
+
+def is_mutual(user_id, other_id):
+    return is_following(user_id, other_id) and is_following(
+        other_id, user_id
+    )
+
+
+def mutual(user_id):
+    """Id пользователей, подписанных на пользователя взаимно."""
+    return frozenset(
+        Follow.objects.filter(
+            author_id=user_id,
+            user_id__in=Follow.objects.filter(
+                user_id=user_id
+            ).values('author_id'),
+        ).values_list('user_id', flat=True).order_by()
+    )
+
+
+def follower_counts(author_ids):
+    """Число подписчиков авторов одним запросом."""
+    counts = dict(
+        UserStats.objects.filter(
+            pk__in=author_ids
+        ).values_list('user_id', 'followers_count')
+    )
+    return {author_id: counts.get(author_id, 0) for author_id in author_ids}
+
+
+def changed(user_id, author_ids, delta):
+    """Счетчики, версии лент и рекомендации после подписки или отписки
+    пользователя ``user_id`` на авторов ``author_ids``."""
+    counters.change_user(user_id, 'following_count', delta * len(author_ids))
+    counters.change_users(author_ids, 'followers_count', delta)
+    usernames = User.objects.filter(
+        pk__in=author_ids
+    ).values_list('username', flat=True)
+    caching.bump(
+        caching.follow_scope(user_id),
+        *(caching.followers_scope(author_id) for author_id in author_ids),
+        *(caching.author_scope(username) for username in usernames)
+    )
+    adjacency.discard((FOLLOWING, user_id))
+    for author_id in author_ids:
+        adjacency.discard((FOLLOWERS, author_id))
+    suggestions.refresh.delay(user_id)
+
+
+def follow(user_id, author_ids):
+    """Подписывает пользователя на авторов, возвращает новые подписки."""
+    wanted = set(author_ids) - {user_id}
+    if not wanted:
+        return set()
+    new = wanted - set(
+        Follow.objects.filter(
+            user_id=user_id, author_id__in=wanted
+        ).values_list('author_id', flat=True)
+    )
+    if not new:
+        return set()
+    # bulk_create не отправляет сигналы, их работа сделана ниже
+    Follow.objects.bulk_create(
+        [Follow(user_id=user_id, author_id=author_id) for author_id in new],
+        ignore_conflicts=True
+    )
+    feed.add_authors(user_id, new)
+    changed(user_id, new, 1)
+    return new
+
+
+def unfollow(user_id, author_ids):
+    """Отписывает пользователя от авторов, возвращает снятые подписки."""
+    follows = Follow.objects.filter(
+        user_id=user_id, author_id__in=set(author_ids)
+    )
+    removed = set(follows.values_list('author_id', flat=True))
+    if removed:
+        # сигналы post_delete убирают посты из ленты и меняют счетчики
+        follows.delete()
+    return removed
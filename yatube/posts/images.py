@@ -0,0 +1,158 @@
+"""Обработка картинок постов при загрузке и удалении.
+
+Размеры проверяются по заголовку без декодирования. Большие JPEG
+декодируются сразу в уменьшенном масштабе (``Image.draft``), затем
+картинка уменьшается до ``POST_IMAGE_MAX_SIZE`` и сохраняется в
+``POST_IMAGE_FORMAT`` без EXIF и других метаданных. Миниатюры потом
+строятся уже из небольшого мастера.
+
+Мастер хранится в ``core.storage`` под хешем своего содержимого, и
+одинаковые картинки разных постов — один файл. Имя мастера запоминается
+в кеше по хешу загруженного файла, так что повторная загрузка той же
+картинки не декодируется. Файл удаляется задачей ``release``, когда на
+него не остается ссылок из постов.
+"""
+import os
+import posixpath
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from core.storage import (
+    content_hash, content_storage, hashed_name, is_hashed
+)
+from jobs.queue import enqueue, task
+
+from . import thumbnails
+from .models import Post
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg', 'PNG': 'png'}
+UPLOAD_DIRECTORY = Post._meta.get_field('image').upload_to
+SOURCE_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def _source_key(digest):
+    return f'images:source:{digest}'
+
+
+def validate(image):
+    """Проверяет размеры по заголовку, не декодируя картинку."""
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f'Картинка {width}×{height} слишком большая, допустимо не '
+            f'более {settings.POST_IMAGE_MAX_PIXELS} пикселей',
+            code='image_too_large',
+        )
+
+
+def _master(image):
+    limit = settings.POST_IMAGE_MAX_SIZE
+    # JPEG декодируется сразу в уменьшенном в 2–8 раз масштабе
+    image.draft('RGB', (limit, limit))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((limit, limit), Image.LANCZOS)
+    has_alpha = image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+    mode = 'RGBA' if has_alpha else 'RGB'
+    if settings.POST_IMAGE_FORMAT == 'JPEG':
+        mode = 'RGB'
+    return image.convert(mode)
+
+
+def process(upload):
+    """Мастер-картинка для загрузки: имя уже сохраненного файла или
+    ``ContentFile`` для сохранения в ``Post.image``."""
+    if upload.size > settings.POST_IMAGE_MAX_BYTES:
+        raise ValidationError(
+            'Файл картинки слишком большой', code='image_too_large'
+        )
+    source = content_hash(upload)
+    name = cache.get(_source_key(source))
+    if name:
+        try:
+            # как и при повторной записи в хранилище, свежая отметка
+            # времени не дает release удалить файл до сохранения поста
+            os.utime(content_storage.path(name))
+        except FileNotFoundError:
+            pass
+        else:
+            return name
+    try:
+        image = Image.open(upload)
+    except Image.DecompressionBombError:
+        raise ValidationError(
+            'Картинка слишком большая', code='image_too_large'
+        )
+    except OSError:
+        raise ValidationError(
+            'Загрузите правильное изображение', code='invalid_image'
+        )
+    validate(image)
+    master = _master(image)
+    output = BytesIO()
+    # без exif= и icc_profile= метаданные в файл не попадают
+    master.save(
+        output, settings.POST_IMAGE_FORMAT,
+        quality=settings.POST_IMAGE_QUALITY, method=4
+    )
+    extension = EXTENSIONS[settings.POST_IMAGE_FORMAT]
+    master = ContentFile(output.getvalue(), name=f'{source}.{extension}')
+    # под этим именем хранилище сохранит мастер вместе с постом
+    cache.set(
+        _source_key(source),
+        hashed_name(UPLOAD_DIRECTORY + master.name, content_hash(master)),
+        SOURCE_TIMEOUT
+    )
+    return master
+
+
+@task(priority=-5, key=lambda name: f'images:release:{name}')
+def release(name):
+    """Удаляет картинку и ее миниатюры, если ни один пост на нее не
+    ссылается."""
+    if Post.objects.filter(image=name).exists():
+        return
+    try:
+        age = time.time() - os.path.getmtime(content_storage.path(name))
+    except FileNotFoundError:
+        return
+    grace = settings.POST_IMAGE_RELEASE_GRACE
+    if age < grace:
+        # файл только что переиспользован загрузкой, пост с ним может
+        # быть еще не сохранен
+        enqueue(
+            'posts.images.release', [name], key=f'images:release:{name}',
+            priority=-5, delay=grace - age
+        )
+        return
+    thumbnails.forget(name)
+    content_storage.delete(name)
+
+
+def adopt(name):
+    """Переносит картинку со старым именем в хранилище по хешу и
+    переключает на нее посты; старый файл освобождает ``release``."""
+    with content_storage.open(name) as source:
+        new_name = content_storage.save(
+            UPLOAD_DIRECTORY + posixpath.basename(name), source
+        )
+    for post in Post.objects.filter(image=name).select_related('author'):
+        post.image = new_name
+        post.save(update_fields=['image', 'updated'])
+    thumbnails.schedule(new_name)
+    return new_name
+
+
+def legacy_names():
+    """Имена картинок постов, сохраненных не по хешу."""
+    names = Post.objects.exclude(image='').order_by().values_list(
+        'image', flat=True
+    ).distinct()
+    return [name for name in names.iterator() if not is_hashed(name)]
@@ -0,0 +1,97 @@
+import json
+import platform
+import time
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.template_loaders import PROFILES
+from core.testing import private_cache
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет тестовую базу синтетическими данными и измеряет время '
+        'ответа страниц постов. Результат выводится в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', nargs='+', choices=benchmark.SCALES,
+            default=['1k'], help='Масштабы данных по числу постов'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Количество запросов к каждой странице'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора синтетических данных'
+        )
+        parser.add_argument(
+            '--template-profile', nargs='+', choices=PROFILES,
+            default=['default'],
+            help='Профили загрузчиков шаблонов для сравнения'
+        )
+        parser.add_argument(
+            '--label', default='',
+            help='Метка прогона, например хеш коммита'
+        )
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для отчета, по умолчанию stdout'
+        )
+
+    def measure_scale(self, scale, options):
+        call_command('flush', interactive=False, verbosity=0)
+        start = time.perf_counter()
+        counts = benchmark.seed(benchmark.SCALES[scale], options['seed'])
+        seed_seconds = time.perf_counter() - start
+        pages = []
+        for profile in options['template_profile']:
+            with override_settings(
+                DEBUG=False, TEMPLATES=benchmark.template_settings(profile)
+            ):
+                for page in benchmark.run(options['requests']):
+                    pages.append({'template_profile': profile, **page})
+        return {
+            'scale': scale,
+            'counts': counts,
+            'seed_seconds': round(seed_seconds, 3),
+            'pages': pages,
+            'peak_rss_kb': benchmark.peak_rss_kb(),
+        }
+
+    def handle(self, *args, **options):
+        report = {
+            'label': options['label'],
+            'started': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'scales': [],
+        }
+        old_name = connection.settings_dict['NAME']
+        # своя база и свой кеш: сброс кеша при замерах не трогает сайт
+        with private_cache():
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                for scale in options['scale']:
+                    report['scales'].append(
+                        self.measure_scale(scale, options)
+                    )
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(output)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as target:
+                target.write(output + '\n')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts import caching, suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации авторов по графу подписок '
+        'и общим группам.'
+    )
+
+    def handle(self, *args, **options):
+        created = suggestions.build()
+        caching.bump(caching.SUGGESTIONS)
+        self.stdout.write(f'Сохранено рекомендаций: {created}')
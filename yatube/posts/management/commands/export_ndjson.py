@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Выгружает группы, посты, комментарии и подписки в NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для выгрузки, по умолчанию stdout'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=transfer.CHUNK_SIZE,
+            help='Размер пачки при чтении из базы'
+        )
+
+    def handle(self, *args, **options):
+        lines = transfer.export_lines(options['chunk_size'])
+        if options['path'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['path'], 'w', encoding='utf-8') as output:
+            output.writelines(lines)
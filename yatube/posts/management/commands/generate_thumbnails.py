@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Ставит в очередь построение миниатюр для картинок постов, у '
+        'которых их нет. Запускается по расписанию, как rank_trending.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько картинок проверять за один запрос'
+        )
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct()
+        batch = []
+        scheduled = 0
+        for name in names.iterator():
+            batch.append(name)
+            if len(batch) >= options['batch_size']:
+                scheduled += self.schedule(batch)
+                batch = []
+        scheduled += self.schedule(batch)
+        self.stdout.write(f'Поставлено в очередь картинок: {scheduled}')
+
+    @staticmethod
+    def schedule(names):
+        missing = thumbnails.missing(names)
+        for name in missing:
+            thumbnails.schedule(name)
+        return len(missing)
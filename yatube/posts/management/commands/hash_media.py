@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts import images
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов, загруженные до хранилища по хешу, '
+        'и объединяет одинаковые файлы.'
+    )
+
+    def handle(self, *args, **options):
+        moved = 0
+        targets = set()
+        for name in images.legacy_names():
+            try:
+                targets.add(images.adopt(name))
+            except FileNotFoundError:
+                self.stderr.write(f'Нет файла {name}')
+                continue
+            moved += 1
+        self.stdout.write(
+            f'Перенесено картинок: {moved}, различных файлов: {len(targets)}'
+        )
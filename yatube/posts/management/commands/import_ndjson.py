@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from posts import caching, transfer
+
+
+class Command(BaseCommand):
+    help = 'Загружает группы, посты, комментарии и подписки из NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл выгрузки, по умолчанию stdin'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=transfer.CHUNK_SIZE,
+            help='Размер пачки bulk_create и транзакции'
+        )
+
+    def handle(self, *args, **options):
+        importer = transfer.Importer(options['chunk_size'])
+        if options['path'] == '-':
+            counts = importer.load(transfer.parse_lines(sys.stdin))
+        else:
+            with open(options['path'], encoding='utf-8') as source:
+                counts = importer.load(transfer.parse_lines(source))
+        for model, total in counts.items():
+            self.stdout.write(f'{model}: {total}')
+        # bulk_create не отправляет сигналы моделей
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('rebuild_feeds', stdout=self.stdout)
+        caching.bump(
+            caching.GLOBAL,
+            *(caching.group_scope(slug) for slug in importer.slugs),
+            *(caching.author_scope(name) for name in importer.authors)
+        )
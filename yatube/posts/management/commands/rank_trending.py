@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import caching, trending
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинг популярных постов и групп.'
+
+    def handle(self, *args, **options):
+        posts, groups = trending.rank()
+        caching.bump(caching.TRENDING)
+        self.stdout.write(
+            f'В рейтинге постов: {posts}, групп: {groups}'
+        )
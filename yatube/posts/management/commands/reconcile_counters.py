@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+def batches(queryset, size):
+    """Первичные ключи таблицы пачками по возрастанию."""
+    last_pk = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', flat=True)[:size]
+        )
+        if not ids:
+            return
+        yield ids
+        last_pk = ids[-1]
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество объектов в одной пачке'
+        )
+
+    def handle(self, *args, **options):
+        size = options['batch_size']
+        recounts = (
+            ('пользователей', User.objects, counters.recount_users),
+            ('групп', Group.objects, counters.recount_groups),
+            ('постов', Post.objects, counters.recount_posts),
+        )
+        for title, queryset, recount in recounts:
+            total = 0
+            for ids in batches(queryset, size):
+                with transaction.atomic():
+                    recount(ids)
+                total += len(ids)
+            self.stdout.write(f'Пересчитано {title}: {total}')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import fulltext
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов.'
+
+    def handle(self, *args, **options):
+        if not fulltext.install():
+            raise CommandError(
+                'Полнотекстовый индекс доступен только в SQLite'
+            )
+        fulltext.rebuild()
+        self.stdout.write('Индекс постов перестроен')
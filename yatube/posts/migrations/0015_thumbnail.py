@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:48
+
+import json
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def schedule_thumbnails(apps, schema_editor):
+    # миниатюры, построенные раньше, не записаны в Thumbnail: задача
+    # найдет их в хранилище sorl и только запишет имена
+    Post = apps.get_model('posts', 'Post')
+    Job = apps.get_model('jobs', 'Job')
+    names = Post.objects.exclude(image='').order_by().values_list(
+        'image', flat=True
+    ).distinct()
+    Job.objects.bulk_create(
+        (
+            Job(
+                name='posts.thumbnails.generate',
+                payload=json.dumps({'args': [name], 'kwargs': {}}),
+                priority=10,
+                key=f'thumbnails:{name}',
+                max_attempts=settings.JOBS_MAX_ATTEMPTS,
+            )
+            for name in names.iterator()
+        ),
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+        ('posts', '0014_content_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Thumbnail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.CharField(max_length=100, verbose_name='Картинка')),
+                ('alias', models.CharField(max_length=20, verbose_name='Размер')),
+                ('name', models.CharField(max_length=255, verbose_name='Файл миниатюры')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='thumbnail',
+            constraint=models.UniqueConstraint(fields=('image', 'alias'), name='unique_thumbnail'),
+        ),
+        migrations.RunPython(schedule_thumbnails, migrations.RunPython.noop),
+    ]
@@ -1,24 +1,32 @@
 from django.conf import settings
 from django.db import models
 from django.contrib.auth import get_user_model
-from core.models import CreatedModel
+from core.models import CountersModel, CreatedModel
+from core.storage import content_storage
 
 
 User = get_user_model()
 
 
-class Group(models.Model):
+class Group(CountersModel):
     title = models.CharField(max_length=200)
     slug = models.SlugField(
         unique=True
     )
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False
+    )
+
+    counter_fields = ('posts_count',)
 
     def __str__(self):
         return self.title
 
 
-class Post(models.Model):
+class Post(CountersModel):
     text = models.TextField(
         verbose_name='Текст поста',
         help_text='Введите текст поста'
@@ -27,6 +35,10 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True,
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -46,14 +58,37 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        storage=content_storage,
+        blank=True,
+        db_index=True
+    )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
     )
 
+    counter_fields = ('comments_count',)
+
     def __str__(self):
         return self.text[:settings.TEXT_NUMBER]
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
 
 class Comment(CreatedModel):
@@ -76,6 +111,13 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'
+            ),
+            models.Index(fields=['created'], name='comment_created_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.text[:settings.TEXT_NUMBER]
@@ -102,3 +144,135 @@ class Follow(models.Model):
                 name='unique_employee_user'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'],
+                name='feed_user_pub_date_idx'
+            )
+        ]
+
+
+class UserStats(models.Model):
+    """Счетчики пользователя, обновляемые вместе с постами и подписками."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Количество постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        db_index=True
+    )
+    following_count = models.PositiveIntegerField(
+        'Количество подписок',
+        default=0
+    )
+
+    def __str__(self):
+        return f'Счетчики {self.user}'
+
+
+class Suggestion(models.Model):
+    """Автор, которого стоит предложить пользователю."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+        verbose_name='Читатель'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Предложенный автор'
+    )
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_suggestion'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-score'],
+                name='suggestion_user_score_idx'
+            )
+        ]
+
+
+class TrendingPost(models.Model):
+    """Пост из рейтинга популярных, который строит ``rank_trending``."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+        verbose_name='Пост'
+    )
+    score = models.FloatField('Оценка', db_index=True)
+
+
+class TrendingGroup(models.Model):
+    """Группа из рейтинга популярных, который строит ``rank_trending``."""
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+        verbose_name='Группа'
+    )
+    score = models.FloatField('Оценка', db_index=True)
+
+
+class Thumbnail(models.Model):
+    """Готовая миниатюра картинки, построенная ``thumbnails.generate``."""
+    image = models.CharField('Картинка', max_length=100)
+    alias = models.CharField('Размер', max_length=20)
+    name = models.CharField('Файл миниатюры', max_length=255)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['image', 'alias'],
+                name='unique_thumbnail'
+            )
+        ]
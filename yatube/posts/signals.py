@@ -0,0 +1,160 @@
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import caching, cards, counters, feed, fulltext, graph, images
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def _bump_post_feeds(post, group_ids):
+    slugs = Group.objects.filter(
+        id__in=[group_id for group_id in group_ids if group_id]
+    ).values_list('slug', flat=True)
+    caching.bump(
+        caching.GLOBAL,
+        caching.post_scope(post.pk),
+        caching.author_scope(post.author.username),
+        *(caching.group_scope(slug) for slug in slugs)
+    )
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+    instance._previous_group_id, instance._previous_image = (
+        Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image'
+        ).first() or (None, '')
+    )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    previous_image = getattr(instance, '_previous_image', '')
+    if previous_image and previous_image != instance.image.name:
+        images.release.delay(previous_image)
+    if created:
+        feed.push_post(instance)
+        counters.change_user(instance.author_id, 'posts_count', 1)
+        counters.change_group(instance.group_id, 1)
+    elif previous_group_id != instance.group_id:
+        counters.change_group(previous_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+    _bump_post_feeds(instance, {instance.group_id, previous_group_id})
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'posts_count', -1)
+    counters.change_group(instance.group_id, -1)
+    cards.forget(instance)
+    if instance.image:
+        images.release.delay(instance.image.name)
+    _bump_post_feeds(instance, {instance.group_id})
+
+
+def _bump_comment_feeds(comment):
+    """Число комментариев поста есть и в лентах API."""
+    post = Post.objects.select_related('author').only(
+        'group_id', 'author__username'
+    ).filter(pk=comment.post_id).first()
+    if post is None:
+        caching.bump(caching.post_scope(comment.post_id))
+        return
+    _bump_post_feeds(post, {post.group_id})
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_post(instance.post_id, 1)
+        _bump_comment_feeds(instance)
+    else:
+        caching.bump(caching.post_scope(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+    _bump_comment_feeds(instance)
+
+
+@receiver(pre_save, sender=Group)
+def group_saving(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+    instance._previous_slug = Group.objects.filter(
+        pk=instance.pk
+    ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    slugs = {instance.slug, getattr(instance, '_previous_slug', None)}
+    caching.bump(*(caching.group_scope(slug) for slug in slugs if slug))
+
+
+def _card_name(user):
+    return user.username, user.first_name, user.last_name
+
+
+def _author_renamed(user):
+    """Имя автора есть в карточках его постов и во всех лентах."""
+    posts = Post.objects.filter(author=user)
+    posts.update(updated=timezone.now())
+    slugs = Group.objects.filter(
+        posts__author=user
+    ).values_list('slug', flat=True).distinct()
+    caching.bump(
+        caching.GLOBAL,
+        *(caching.group_scope(slug) for slug in slugs),
+        *(caching.post_scope(pk) for pk in posts.values_list('pk', flat=True))
+    )
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is None:
+        return
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    instance._previous_name = User.objects.filter(
+        pk=instance.pk
+    ).values_list('username', 'first_name', 'last_name').first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    if kwargs.get('created'):
+        counters.recount_users([instance.pk])
+    previous_name = getattr(instance, '_previous_name', None)
+    if previous_name and previous_name != _card_name(instance):
+        _author_renamed(instance)
+    caching.bump(caching.author_scope(instance.username))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        feed.add_author(instance.user_id, instance.author_id)
+        graph.changed(instance.user_id, [instance.author_id], 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    feed.remove_author(instance.user_id, instance.author_id)
+    graph.changed(instance.user_id, [instance.author_id], -1)
+
+
+def install_search_index(sender, using, **kwargs):
+    fulltext.install(connections[using])
@@ -0,0 +1,188 @@
+"""Рекомендации авторов («вам может понравиться»).
+
+Оценка кандидата складывается из двух частей:
+
+* друзья друзей — сколько авторов из подписок пользователя подписаны на
+  кандидата;
+* общие группы — насколько кандидат пишет в группы, где пишут сам
+  пользователь и его авторы, с весом по доле постов в группе.
+
+Команда ``build_suggestions`` считает рекомендации для всех сразу по
+графу подписок в сжатом построчном виде (CSR) на ``array`` и заменяет
+их частями по ``USERS_PER_TRANSACTION`` пользователей: SQLite на время
+транзакции блокирует всех остальных писателей. После подписки или
+отписки фоновая задача пересчитывает рекомендации одного пользователя
+несколькими запросами. Страницы читают готовый список из
+``Suggestion`` по индексу (user, -score).
+"""
+import heapq
+from array import array
+from collections import Counter, defaultdict
+from itertools import accumulate
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from jobs.queue import task
+
+from . import caching
+from .models import Follow, Post, Suggestion, User
+
+FOF_WEIGHT = 1.0
+GROUP_WEIGHT = 2.0
+GROUP_AUTHORS = 50
+BATCH_SIZE = 5_000
+USERS_PER_TRANSACTION = 500
+
+
+class FollowGraph:
+    """Подписки всех пользователей: ``targets[offsets[i]:offsets[i + 1]]``
+    — авторы пользователя с индексом ``i``."""
+
+    def __init__(self):
+        ids = User.objects.order_by('pk').values_list('pk', flat=True)
+        self.ids = array('q', ids)
+        self.index = {user_id: i for i, user_id in enumerate(self.ids)}
+        counts = array('q', [0]) * (len(self.ids) + 1)
+        self.targets = array('q')
+        edges = Follow.objects.order_by('user_id', 'author_id').values_list(
+            'user_id', 'author_id'
+        )
+        for user_id, author_id in edges.iterator():
+            counts[self.index[user_id] + 1] += 1
+            self.targets.append(author_id)
+        self.offsets = array('q', accumulate(counts))
+
+    def neighbours(self, user_id):
+        i = self.index.get(user_id)
+        if i is None:
+            return ()
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+
+def _group_posts(posts):
+    """Число постов авторов по группам: ``{author: [(group, n)]}``
+    и ``{group: [(author, доля постов)]}`` с самыми активными авторами."""
+    by_author = defaultdict(list)
+    by_group = defaultdict(list)
+    rows = posts.filter(group__isnull=False).order_by().values_list(
+        'author_id', 'group_id'
+    ).annotate(posts=Count('id'))
+    for author_id, group_id, count in rows.iterator():
+        by_author[author_id].append((group_id, count))
+        by_group[group_id].append((author_id, count))
+    for group_id, authors in by_group.items():
+        total = sum(count for _, count in authors)
+        by_group[group_id] = [
+            (author_id, count / total)
+            for author_id, count in heapq.nlargest(
+                GROUP_AUTHORS, authors, key=lambda item: item[1]
+            )
+        ]
+    return by_author, by_group
+
+
+def rank(user_id, neighbours, author_groups, group_authors, limit):
+    """Лучшие кандидаты пользователя в виде пар (автор, оценка)."""
+    followed = set(neighbours(user_id))
+    scores = Counter()
+    for author_id in followed:
+        for candidate in neighbours(author_id):
+            scores[candidate] += FOF_WEIGHT
+    weights = Counter()
+    for author_id in followed | {user_id}:
+        for group_id, count in author_groups.get(author_id, ()):
+            weights[group_id] += count
+    total = sum(weights.values())
+    for group_id, weight in weights.items():
+        for candidate, share in group_authors.get(group_id, ()):
+            scores[candidate] += GROUP_WEIGHT * share * weight / total
+    for excluded in followed | {user_id}:
+        scores.pop(excluded, None)
+    return heapq.nlargest(
+        limit, scores.items(), key=lambda item: (item[1], -item[0])
+    )
+
+
+def _rows(user_id, ranked):
+    return [
+        Suggestion(user_id=user_id, author_id=author_id, score=score)
+        for author_id, score in ranked
+    ]
+
+
+def _replace(user_ids, rows):
+    """Заменяет рекомендации пользователей одной короткой транзакцией."""
+    with transaction.atomic():
+        Suggestion.objects.filter(user_id__in=user_ids).delete()
+        Suggestion.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
+
+
+def build():
+    """Пересчитывает рекомендации всех пользователей."""
+    graph = FollowGraph()
+    author_groups, group_authors = _group_posts(Post.objects.all())
+    limit = settings.SUGGESTIONS_STORED
+    created = 0
+    user_ids = []
+    rows = []
+    for user_id in graph.ids:
+        user_ids.append(user_id)
+        rows.extend(_rows(user_id, rank(
+            user_id, graph.neighbours, author_groups, group_authors, limit
+        )))
+        if len(user_ids) >= USERS_PER_TRANSACTION:
+            created += _replace(user_ids, rows)
+            user_ids = []
+            rows = []
+    return created + _replace(user_ids, rows)
+
+
+@task(priority=-10, key=lambda user_id: f'suggestions:{user_id}')
+def refresh(user_id):
+    """Пересчитывает рекомендации одного пользователя."""
+    edges = defaultdict(list)
+    followed = list(
+        Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True
+        )
+    )
+    edges[user_id] = followed
+    for follower_id, author_id in Follow.objects.filter(
+        user_id__in=followed
+    ).values_list('user_id', 'author_id'):
+        edges[follower_id].append(author_id)
+    author_groups, _ = _group_posts(
+        Post.objects.filter(author_id__in=[user_id, *followed])
+    )
+    _, group_authors = _group_posts(Post.objects.filter(
+        group_id__in={
+            group_id
+            for groups in author_groups.values()
+            for group_id, _ in groups
+        }
+    ))
+    ranked = rank(
+        user_id, lambda node: edges.get(node, ()), author_groups,
+        group_authors, settings.SUGGESTIONS_STORED
+    )
+    _replace([user_id], _rows(user_id, ranked))
+    # задача выполняется вне транзакции, и запись выше уже зафиксирована;
+    # страницы с рекомендациями могли закешироваться до пересчета
+    caching.bump(caching.follow_scope(user_id))
+
+
+def for_user(user):
+    """Рекомендованные пользователю авторы для показа на странице."""
+    if not user.is_authenticated:
+        return []
+    return [
+        suggestion.author
+        for suggestion in Suggestion.objects.filter(
+            user=user
+        ).select_related('author').order_by('-score')[
+            :settings.SUGGESTIONS_NUMBER
+        ]
+    ]
@@ -0,0 +1,17 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, alias='card'):
+    """Готовая миниатюра картинки или None, если она еще строится.
+
+    Миниатюры ставятся в очередь при сохранении поста, страница только
+    читает их и ничего не пишет в базу.
+    """
+    if not image:
+        return None
+    return thumbnails.cached(image.name, alias)
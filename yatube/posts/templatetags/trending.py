@@ -0,0 +1,18 @@
+from django import template
+from django.conf import settings
+
+from posts.models import TrendingGroup
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/trending_groups.html')
+def trending_groups():
+    """Популярные группы из таблицы рейтинга."""
+    return {
+        'groups': [
+            item.group for item in TrendingGroup.objects.select_related(
+                'group'
+            ).order_by('-score')[:settings.TRENDING_GROUPS]
+        ]
+    }
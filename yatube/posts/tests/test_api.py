@@ -0,0 +1,119 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import api
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+PAGE_NOMBER = 3
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(api.PAGE_SIZE + PAGE_NOMBER):
+            cls.post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Текст {i}'
+            )
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Ответ')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_feeds(self):
+        """Ленты отдают страницы постов по курсору"""
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group', kwargs={'slug': self.group.slug}),
+            reverse('posts:api_profile', kwargs={'username': 'author'}),
+            reverse('posts:api_follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(len(data['results']), api.PAGE_SIZE)
+                first = data['results'][0]
+                self.assertEqual(first['id'], self.post.id)
+                self.assertEqual(
+                    first['author'],
+                    {'username': 'author', 'name': 'Лев Толстой'}
+                )
+                self.assertEqual(first['group']['slug'], self.group.slug)
+                self.assertEqual(first['comments'], 1)
+                rest = self.client.get(url, {'cursor': data['next']}).json()
+                self.assertEqual(len(rest['results']), PAGE_NOMBER)
+                self.assertIsNone(rest['next'])
+
+    def test_post_detail(self):
+        """Пост отдается вместе с первыми комментариями"""
+        data = self.client.get(reverse(
+            'posts:api_post_detail', kwargs={'post_id': self.post.id}
+        )).json()
+        self.assertEqual(data['post']['text'], self.post.text)
+        self.assertEqual([row['text'] for row in data['comments']], ['Ответ'])
+        self.assertIsNone(data['next'])
+
+    def test_etag(self):
+        """Неизменная лента отвечает 304 без запросов к постам"""
+        url = reverse('posts:api_group', kwargs={'slug': self.group.slug})
+        response = self.client.get(url)
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any(
+            'posts_post' in query['sql'] for query in queries.captured_queries
+        ))
+        Post.objects.create(
+            author=self.author, group=self.group, text='Новый пост'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_comments_refresh_feed_etag(self):
+        """Новый или удаленный комментарий меняет ETag лент с постом"""
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group', kwargs={'slug': self.group.slug}),
+            reverse('posts:api_profile', kwargs={'username': 'author'}),
+        )
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Еще ответ'
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['results'][0]['comments'], 2)
+                etags[url] = response['ETag']
+        comment.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['results'][0]['comments'], 1)
+
+    def test_follow_requires_login(self):
+        """Лента подписок недоступна анонимному пользователю"""
+        response = Client().get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,33 @@
+from django.test import TestCase
+
+from .. import benchmark
+from ..models import FeedEntry, Post
+
+
+class BenchmarkTest(TestCase):
+    def test_percentile(self):
+        """Перцентили считаются с интерполяцией"""
+        values = [4, 1, 3, 2]
+        self.assertEqual(benchmark.percentile(values, 0), 1)
+        self.assertEqual(benchmark.percentile(values, 50), 2.5)
+        self.assertEqual(benchmark.percentile(values, 100), 4)
+        self.assertEqual(benchmark.percentile([7], 99), 7)
+
+    def test_seed_and_run(self):
+        """Синтетические данные заполняются, все страницы измеряются"""
+        counts = benchmark.seed(200)
+        self.assertEqual(counts['posts'], 200)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertTrue(FeedEntry.objects.exists())
+        pages = benchmark.run(requests=2)
+        self.assertEqual(
+            [page['name'] for page in pages],
+            ['posts:index', 'posts:group', 'posts:profile',
+             'posts:post_detail', 'posts:follow_index']
+        )
+        for page in pages:
+            for mode in ('cold', 'warm'):
+                self.assertLessEqual(
+                    page[mode]['p50_ms'], page[mode]['p99_ms']
+                )
+                self.assertGreater(page[mode]['queries'], 0)
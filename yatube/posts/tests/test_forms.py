@@ -1,13 +1,27 @@
+import hashlib
+import os
 import tempfile
 import shutil
 from http import HTTPStatus
+from importlib import import_module
+from io import BytesIO, StringIO
 
+from django.apps import apps
 from django.contrib.auth import get_user_model
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from PIL import Image
 
+from core.storage import is_hashed
+
+from jobs import queue
+from jobs.models import Job
+
+from .. import images, thumbnails
 from ..models import Group, Post, Comment
 
 User = get_user_model()
@@ -18,6 +32,15 @@ EDIT_URL = 'posts:post_edit'
 CREATE_URL = 'posts:post_create'
 COMMENT_URL = 'posts:add_comment'
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+UPLOAD_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -89,7 +112,12 @@ class PostFormTests(TestCase):
         new_post = Post.objects.latest('id')
         self.assertEqual(new_post.author, self.user)
         self.assertEqual(new_post.group, self.group)
-        self.assertEqual(new_post.image.name, 'posts/small.gif')
+        with new_post.image.open('rb') as image:
+            digest = hashlib.sha256(image.read()).hexdigest()
+        self.assertEqual(
+            new_post.image.name,
+            f'posts/{digest[:2]}/{digest[2:4]}/{digest}.webp'
+        )
 
     def test_post_edit_authorized_user(self):
         """Запись редактирует авторизованый пользователь."""
@@ -170,3 +198,189 @@ class PostFormTests(TestCase):
             Comment.objects.count(),
             comments_count + 1
         )
+
+    @override_settings(JOBS_EAGER=True)
+    def test_thumbnail_pregenerated(self):
+        """Миниатюры строятся после сохранения поста"""
+        uploaded = SimpleUploadedFile(
+            name='thumb.gif', content=SMALL_GIF, content_type='image/gif'
+        )
+        self.authorized_client.post(
+            reverse(CREATE_URL),
+            data={'text': 'Пост с картинкой', 'image': uploaded},
+        )
+        new_post = Post.objects.latest('id')
+        thumbnail = thumbnails.cached(new_post.image.name)
+        self.assertIsNotNone(thumbnail)
+        response = self.guest_client.get(
+            reverse(DETAIL_URL, kwargs={'post_id': new_post.id})
+        )
+        self.assertContains(response, thumbnail.url)
+
+    def test_thumbnail_placeholder(self):
+        """Пока миниатюра не готова, выводится заглушка"""
+        post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile(
+                name='wait.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        response = self.guest_client.get(
+            reverse(DETAIL_URL, kwargs={'post_id': post.id})
+        )
+        self.assertContains(response, 'thumbnail-placeholder.svg')
+        self.assertIsNone(thumbnails.cached(post.image.name))
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOBS_EAGER=True)
+    def test_generate_thumbnails_command(self):
+        """Команда строит миниатюры картинок, оставшихся без них"""
+        post = Post.objects.create(
+            text='Старый пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile(
+                name='old.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        self.assertIsNone(thumbnails.cached(post.image.name))
+        out = StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn('картинок: 1', out.getvalue())
+        thumbnail = thumbnails.cached(post.image.name)
+        self.assertIsNotNone(thumbnail)
+        self.assertTrue(thumbnail.exists())
+        out = StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn('картинок: 0', out.getvalue())
+
+    def test_migration_schedules_thumbnails(self):
+        """Миграция ставит в очередь миниатюры уже загруженных картинок"""
+        post = Post.objects.create(
+            text='Старый пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile(
+                name='legacy.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        migration = import_module('posts.migrations.0015_thumbnail')
+        migration.schedule_thumbnails(apps, None)
+        job = Job.objects.get()
+        self.assertEqual(job.name, 'posts.thumbnails.generate')
+        self.assertEqual(job.key, f'thumbnails:{post.image.name}')
+
+
+@override_settings(
+    MEDIA_ROOT=UPLOAD_MEDIA_ROOT, POST_IMAGE_MAX_SIZE=64,
+    POST_IMAGE_MAX_PIXELS=1_000_000
+)
+class PostImageUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(UPLOAD_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def jpeg(self, size, name='photo.jpg'):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        output = BytesIO()
+        Image.new('RGB', size, 'red').save(output, 'JPEG', exif=exif)
+        return SimpleUploadedFile(
+            name=name, content=output.getvalue(), content_type='image/jpeg'
+        )
+
+    def create(self, upload):
+        return self.client.post(
+            reverse(CREATE_URL), data={'text': 'Фото', 'image': upload}
+        )
+
+    def test_master_downscaled_without_metadata(self):
+        """Картинка уменьшается, перекодируется и теряет метаданные"""
+        self.create(self.jpeg((400, 200)))
+        post = Post.objects.latest('id')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (64, 32))
+            self.assertNotIn('exif', image.info)
+
+    def test_identical_uploads_deduplicated(self):
+        """Одинаковые загрузки используют один файл"""
+        self.create(self.jpeg((100, 100), name='first.jpg'))
+        self.create(self.jpeg((100, 100), name='second.jpg'))
+        first, second = Post.objects.order_by('id')
+        self.assertEqual(first.image.name, second.image.name)
+
+    @override_settings(JOBS_EAGER=True, POST_IMAGE_RELEASE_GRACE=0)
+    def test_shared_image_deleted_with_last_post(self):
+        """Общая картинка удаляется вместе с последним постом"""
+        self.create(self.jpeg((100, 100), name='first.jpg'))
+        self.create(self.jpeg((100, 100), name='second.jpg'))
+        first, second = Post.objects.order_by('id')
+        path = first.image.path
+        thumbnail = thumbnails.cached(first.image.name)
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(thumbnail.storage.path(
+            thumbnail.name
+        )))
+
+    @override_settings(JOBS_EAGER=True, POST_IMAGE_RELEASE_GRACE=0)
+    def test_replaced_image_released(self):
+        """Замененная при редактировании картинка удаляется"""
+        self.create(self.jpeg((100, 100)))
+        post = Post.objects.get()
+        path = post.image.path
+        self.client.post(
+            reverse(EDIT_URL, kwargs={'post_id': post.id}),
+            data={'text': 'Фото', 'image': self.jpeg((50, 80))}
+        )
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.path, path)
+        self.assertFalse(os.path.exists(path))
+
+    @override_settings(JOBS_EAGER=True, POST_IMAGE_RELEASE_GRACE=0)
+    def test_hash_media(self):
+        """Старые картинки переносятся в хранилище по хешу"""
+        for name in ('old/a.jpg', 'old/b.jpg'):
+            Post.objects.create(
+                text='Старый пост', author=self.user,
+                image=default_storage.save(name, self.jpeg((10, 10)))
+            )
+        call_command('hash_media', stdout=StringIO())
+        first, second = Post.objects.order_by('id')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_hashed(first.image.name))
+        self.assertFalse(default_storage.exists('old/a.jpg'))
+        self.assertFalse(default_storage.exists('old/b.jpg'))
+
+    @override_settings(POST_IMAGE_RELEASE_GRACE=600)
+    def test_reupload_protects_released_image(self):
+        """Повторная загрузка не дает удалить файл до сохранения поста"""
+        self.create(self.jpeg((100, 100)))
+        post = Post.objects.get()
+        path = post.image.path
+        post.delete()
+        os.utime(path, (1, 1))
+        upload = self.jpeg((100, 100))
+        self.assertEqual(images.process(upload), post.image.name)
+        queue.run_pending()
+        self.assertTrue(os.path.exists(path))
+
+    def test_too_many_pixels(self):
+        """Слишком большая по размерам картинка отклоняется"""
+        response = self.create(self.jpeg((1001, 1000)))
+        self.assertFalse(Post.objects.exists())
+        self.assertFormError(
+            response, 'form', 'image',
+            'Картинка 1001×1000 слишком большая, допустимо не более '
+            '1000000 пикселей'
+        )
@@ -0,0 +1,107 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete
+from django.test import TestCase
+
+from .. import graph
+from ..models import FeedEntry, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)
+        ]
+        cls.author_ids = [author.pk for author in cls.authors]
+        for author in cls.authors:
+            Post.objects.create(author=author, text=f'Пост {author}')
+
+    def setUp(self):
+        cache.clear()
+        graph.adjacency.clear()
+
+    def stats(self, user):
+        return UserStats.objects.get(pk=user.pk)
+
+    def test_bulk_follow(self):
+        """Массовая подписка обновляет счетчики и ленту"""
+        new = graph.follow(
+            self.reader.pk, self.author_ids + [self.reader.pk]
+        )
+        self.assertEqual(new, set(self.author_ids))
+        self.assertEqual(graph.follow(self.reader.pk, self.author_ids), set())
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 3
+        )
+        self.assertEqual(self.stats(self.reader).following_count, 3)
+        self.assertEqual(
+            graph.follower_counts(self.author_ids),
+            dict.fromkeys(self.author_ids, 1)
+        )
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 3
+        )
+
+    def test_bulk_unfollow(self):
+        """Массовая отписка убирает подписки и посты из ленты"""
+        graph.follow(self.reader.pk, self.author_ids)
+        removed = graph.unfollow(self.reader.pk, self.author_ids[:2])
+        self.assertEqual(removed, set(self.author_ids[:2]))
+        self.assertEqual(graph.following(self.reader.pk), {self.author_ids[2]})
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(self.stats(self.authors[0]).followers_count, 0)
+        self.assertEqual(
+            set(FeedEntry.objects.filter(
+                user=self.reader
+            ).values_list('post__author', flat=True)),
+            {self.author_ids[2]}
+        )
+
+    def test_unfollow_sends_signals(self):
+        """Отписка отправляет post_delete для каждой подписки"""
+        graph.follow(self.reader.pk, self.author_ids)
+        deleted = []
+
+        def receiver(sender, instance, **kwargs):
+            deleted.append(instance.author_id)
+
+        post_delete.connect(receiver, sender=Follow)
+        self.addCleanup(post_delete.disconnect, receiver, sender=Follow)
+        graph.unfollow(self.reader.pk, self.author_ids[:2])
+        self.assertEqual(sorted(deleted), sorted(self.author_ids[:2]))
+
+    def test_batched_checks(self):
+        """Проверка подписок на страницу авторов идет из памяти"""
+        graph.follow(self.reader.pk, self.author_ids[:2])
+        self.assertEqual(
+            graph.followed_among(self.reader.pk, self.author_ids),
+            set(self.author_ids[:2])
+        )
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                graph.is_following(self.reader.pk, self.author_ids[0])
+            )
+            self.assertFalse(
+                graph.is_following(self.reader.pk, self.author_ids[2])
+            )
+
+    def test_signals_invalidate(self):
+        """Подписка через модель тоже сбрасывает закешированное множество"""
+        self.assertEqual(graph.followers(self.author_ids[0]), set())
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        self.assertEqual(
+            graph.followers(self.author_ids[0]), {self.reader.pk}
+        )
+
+    def test_mutual(self):
+        """Взаимные подписки"""
+        graph.follow(self.reader.pk, self.author_ids[:2])
+        graph.follow(self.author_ids[0], [self.reader.pk])
+        self.assertEqual(graph.mutual(self.reader.pk), {self.author_ids[0]})
+        self.assertTrue(graph.is_mutual(self.reader.pk, self.author_ids[0]))
+        self.assertFalse(graph.is_mutual(self.reader.pk, self.author_ids[1]))
@@ -1,8 +1,11 @@
+from io import StringIO
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -39,3 +42,73 @@ class PostModelTest(TestCase):
         self.assertEqual(verbose, 'Группа')
         help_text = post._meta.get_field('group').help_text
         self.assertEqual(help_text, 'Группа, к которой будет относиться пост')
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def assertCounters(self):
+        self.user.stats.refresh_from_db()
+        self.reader.stats.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.user.stats.posts_count, self.user.posts.count())
+        self.assertEqual(
+            self.group.posts_count, self.group.posts.count()
+        )
+        self.assertEqual(
+            self.user.stats.followers_count, self.user.following.count()
+        )
+        self.assertEqual(
+            self.reader.stats.following_count, self.reader.follower.count()
+        )
+        for post in Post.objects.all():
+            self.assertEqual(post.comments_count, post.comments.count())
+
+    def test_copy_and_forced_insert(self):
+        """Копия через pk = None и save(force_insert=True) создают строки"""
+        group = Group.objects.get(pk=self.group.pk)
+        group.pk = None
+        group.slug = 'copy-slug'
+        group.save()
+        self.assertNotEqual(group.pk, self.group.pk)
+        group = Group.objects.get(pk=self.group.pk)
+        group.pk = None
+        group.slug = 'forced-slug'
+        group.save(force_insert=True)
+        self.assertEqual(Group.objects.count(), 3)
+
+    def test_counters_follow_changes(self):
+        """Счетчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.assertCounters()
+        self.assertEqual(self.user.stats.posts_count, 1)
+        post.group = None
+        post.save()
+        self.assertCounters()
+        Follow.objects.filter(user=self.reader).delete()
+        post.delete()
+        self.assertCounters()
+        self.assertEqual(self.user.stats.posts_count, 0)
+
+    def test_reconcile_counters(self):
+        """Команда пересчитывает счетчики после массовой вставки."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text='Текст', group=self.group)
+            for _ in range(3)
+        )
+        call_command('reconcile_counters', batch_size=2, stdout=StringIO())
+        self.assertCounters()
+        self.assertEqual(self.group.posts_count, 3)
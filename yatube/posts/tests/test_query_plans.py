@@ -0,0 +1,93 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+CHECKED_TABLES = (
+    'posts_post',
+    'posts_comment',
+    'posts_follow',
+    'posts_feedentry',
+    'posts_group',
+    'posts_userstats',
+)
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(15):
+            post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Текст {i}'
+            )
+        Comment.objects.create(post=post, author=cls.reader, text='Текст')
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def full_scans(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            details = [row[-1] for row in cursor.fetchall()]
+        scans = []
+        for detail in details:
+            match = FULL_SCAN.match(detail)
+            if match and match.group(1) in CHECKED_TABLES:
+                scans.append(detail)
+        return scans
+
+    def assertNoFullScans(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            with self.subTest(url=url, sql=sql):
+                self.assertEqual(self.full_scans(sql), [])
+        return response
+
+    def test_list_views_use_indexes(self):
+        """Запросы страниц не переходят к полному сканированию таблиц"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            response = self.assertNoFullScans(url)
+            page_obj = response.context.get('page_obj')
+            if page_obj is not None and page_obj.has_next():
+                self.assertNoFullScans(url + '?' + page_obj.next_query)
+
+    def test_full_scan_is_detected(self):
+        """Проверка распознает полное сканирование таблицы"""
+        self.assertTrue(
+            self.full_scans('SELECT * FROM posts_post WHERE text = "x"')
+        )
@@ -0,0 +1,136 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from jobs import queue
+
+from .. import graph, suggestions
+from ..models import Follow, Group, Post, Suggestion
+
+User = get_user_model()
+
+
+class SuggestionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader, cls.friend, cls.liked, cls.writer, cls.other = [
+            User.objects.create_user(username=name)
+            for name in ('reader', 'friend', 'liked', 'writer', 'other')
+        ]
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание'
+        )
+        Post.objects.bulk_create([
+            Post(author=cls.reader, group=cls.group, text='Пост читателя'),
+            Post(author=cls.writer, group=cls.group, text='Пост автора'),
+            Post(author=cls.writer, group=cls.group, text='Еще пост'),
+            Post(author=cls.other, text='Пост без группы'),
+        ])
+        Follow.objects.bulk_create([
+            Follow(user=cls.reader, author=cls.friend),
+            Follow(user=cls.friend, author=cls.liked),
+            Follow(user=cls.friend, author=cls.reader),
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def suggested(self, user):
+        return list(
+            Suggestion.objects.filter(user=user).order_by(
+                '-score'
+            ).values_list('author__username', flat=True)
+        )
+
+    def test_follow_graph(self):
+        """Подписки хранятся в массивах по пользователям"""
+        follows = suggestions.FollowGraph()
+        self.assertEqual(list(follows.neighbours(self.reader.pk)),
+                         [self.friend.pk])
+        self.assertEqual(
+            sorted(follows.neighbours(self.friend.pk)),
+            sorted([self.liked.pk, self.reader.pk])
+        )
+        self.assertEqual(list(follows.neighbours(self.other.pk)), [])
+
+    def test_build(self):
+        """Кандидаты — друзья друзей и авторы из общих групп"""
+        call_command('build_suggestions', stdout=StringIO())
+        self.assertEqual(self.suggested(self.reader), ['writer', 'liked'])
+        self.assertNotIn('friend', self.suggested(self.reader))
+        self.assertEqual(self.suggested(self.other), [])
+
+    def test_build_in_chunks(self):
+        """Полный расчет пишет рекомендации частями"""
+        suggestions.build()
+        built = {user: self.suggested(user) for user in (
+            self.reader, self.friend, self.other
+        )}
+        replace = mock.patch.object(
+            suggestions, '_replace', wraps=suggestions._replace
+        )
+        with mock.patch.object(suggestions, 'USERS_PER_TRANSACTION', 2):
+            with replace as replaced:
+                created = suggestions.build()
+        self.assertEqual(replaced.call_count, 3)
+        self.assertEqual(created, Suggestion.objects.count())
+        for user, expected in built.items():
+            self.assertEqual(self.suggested(user), expected)
+
+    def test_refresh_matches_build(self):
+        """Пересчет одного пользователя совпадает с полным расчетом"""
+        suggestions.build()
+        built = self.suggested(self.reader)
+        Suggestion.objects.all().delete()
+        suggestions.refresh(self.reader.pk)
+        self.assertEqual(self.suggested(self.reader), built)
+
+    def test_follow_updates_suggestions(self):
+        """После подписки фоновая задача убирает автора из рекомендаций"""
+        suggestions.build()
+        graph.follow(self.reader.pk, [self.writer.pk])
+        self.assertEqual(queue.run_pending(), 1)
+        self.assertEqual(self.suggested(self.reader), ['liked'])
+        Follow.objects.create(user=self.reader, author=self.liked)
+        self.assertEqual(queue.run_pending(), 1)
+        self.assertEqual(self.suggested(self.reader), [])
+
+    def test_refresh_invalidates_pages(self):
+        """Пересчет рекомендаций сбрасывает закешированные страницы"""
+        client = Client()
+        client.force_login(self.reader)
+        url = reverse('posts:profile', kwargs={'username': 'other'})
+        response = client.get(url)
+        self.assertNotContains(response, '/profile/writer/')
+        suggestions.refresh(self.reader.pk)
+        self.assertContains(client.get(url), '/profile/writer/')
+        self.assertEqual(
+            client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+            200
+        )
+
+    def test_pages_show_suggestions(self):
+        """Рекомендации видны в ленте подписок и в профиле"""
+        suggestions.build()
+        client = Client()
+        client.force_login(self.reader)
+        for url in (
+            reverse('posts:follow_index'),
+            reverse('posts:profile', kwargs={'username': 'other'}),
+        ):
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual(
+                    response.context['suggestions'],
+                    [self.writer, self.liked]
+                )
+                self.assertContains(
+                    response,
+                    reverse('posts:profile', kwargs={'username': 'writer'})
+                )
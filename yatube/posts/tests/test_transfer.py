@@ -0,0 +1,73 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class TransferCommandsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(5):
+            post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Текст {i}'
+            )
+        Comment.objects.create(post=post, author=cls.reader, text='Ответ')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('pub_date').values_list(
+                'text', 'pub_date', 'author__username', 'group__slug',
+                'comments_count'
+            )),
+            list(Comment.objects.values_list(
+                'post__text', 'author__username', 'text', 'created'
+            )),
+            list(Follow.objects.values_list(
+                'user__username', 'author__username'
+            )),
+        )
+
+    def test_export_import_roundtrip(self):
+        """Выгрузка и загрузка сохраняют данные и даты"""
+        before = self.snapshot()
+        handle, path = tempfile.mkstemp(suffix='.ndjson')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        call_command('export_ndjson', path, chunk_size=2)
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        call_command('import_ndjson', path, chunk_size=2, stdout=StringIO())
+        self.assertEqual(self.snapshot(), before)
+        author = User.objects.get(username='author')
+        self.assertEqual(author.stats.posts_count, 5)
+        self.assertFalse(author.has_usable_password())
+        reader = User.objects.get(username='reader')
+        self.assertEqual(reader.feed_entries.count(), 5)
+
+    def test_export_to_stdout(self):
+        """Выгрузка без пути пишется в stdout команды"""
+        handle, path = tempfile.mkstemp(suffix='.ndjson')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        call_command('export_ndjson', path)
+        output = StringIO()
+        call_command('export_ndjson', stdout=output)
+        with open(path, encoding='utf-8') as exported:
+            self.assertEqual(output.getvalue(), exported.read())
@@ -0,0 +1,126 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending
+from ..models import Comment, Group, Post, TrendingGroup, TrendingPost
+from ..transfer import keep_auto_now_add
+
+User = get_user_model()
+
+HOUR = 60 * 60
+
+
+@override_settings(
+    TRENDING_WINDOW=48 * HOUR, TRENDING_HALF_LIFE=12 * HOUR,
+    TRENDING_SLICES=48, TRENDING_POSTS=2, TRENDING_GROUPS=1,
+)
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.now = timezone.now()
+        cls.author = User.objects.create_user(username='author')
+        cls.hot_group, cls.cold_group = [
+            Group.objects.create(
+                title=f'Группа {slug}', slug=slug, description='Описание'
+            )
+            for slug in ('hot', 'cold')
+        ]
+        with keep_auto_now_add(
+            Post._meta.get_field('pub_date'),
+            Comment._meta.get_field('created'),
+        ):
+            cls.old = cls.post(cls.hot_group, days=30)
+            cls.fresh = cls.post(cls.cold_group, days=0)
+            cls.stale = cls.post(cls.cold_group, days=30)
+            # середины часовых срезов окна
+            cls.comment(cls.old, hours=1.5, count=5)
+            cls.comment(cls.stale, hours=40.5, count=5)
+            cls.comment(cls.stale, hours=100, count=50)
+
+    @classmethod
+    def post(cls, group, days):
+        return Post.objects.create(
+            author=cls.author, group=group, text='Текст',
+            pub_date=cls.now - timedelta(days=days, minutes=1)
+        )
+
+    @classmethod
+    def comment(cls, post, hours, count):
+        for _ in range(count):
+            Comment.objects.create(
+                post=post, author=cls.author, text='Комментарий',
+                created=cls.now - timedelta(hours=hours)
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_scores_decay(self):
+        """Свежие события весят больше, события вне окна не учитываются"""
+        posts, groups = trending.scores(self.now)
+        self.assertAlmostEqual(
+            posts[self.old.pk], 5 * 0.5 ** (1.5 / 12)
+        )
+        self.assertAlmostEqual(
+            posts[self.stale.pk], 5 * 0.5 ** (40.5 / 12)
+        )
+        self.assertAlmostEqual(
+            posts[self.fresh.pk], trending.POST_WEIGHT, delta=0.01
+        )
+        self.assertEqual(
+            groups[self.cold_group.pk],
+            posts[self.fresh.pk] + posts[self.stale.pk]
+        )
+
+    def test_rank(self):
+        """В таблицы рейтинга попадают только лучшие посты и группы"""
+        call_command('rank_trending', stdout=StringIO())
+        self.assertEqual(
+            list(TrendingPost.objects.order_by(
+                '-score'
+            ).values_list('post', flat=True)),
+            [self.old.pk, self.fresh.pk]
+        )
+        self.assertEqual(
+            list(TrendingGroup.objects.values_list('group', flat=True)),
+            [self.hot_group.pk]
+        )
+
+    def test_views_read_ranking(self):
+        """Страницы читают готовый рейтинг без агрегации комментариев"""
+        trending.rank(self.now)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [self.old.pk, self.fresh.pk]
+        )
+        self.assertFalse(any(
+            'posts_comment' in query['sql']
+            for query in queries.captured_queries
+        ))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Популярные группы')
+        self.assertContains(response, reverse('posts:trending'))
+
+    def test_deleted_post_leaves_trending(self):
+        """Удаленный пост сразу пропадает со страницы популярного"""
+        trending.rank(self.now)
+        url = reverse('posts:trending')
+        self.client.get(url)
+        Post.objects.get(pk=self.old.pk).delete()
+        response = self.client.get(url)
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [self.fresh.pk]
+        )
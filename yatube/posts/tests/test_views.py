@@ -1,13 +1,26 @@
 from http import HTTPStatus
+from importlib import import_module
+from unittest import mock
 
+from django.apps import apps
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.db import connection, router
+from django.http import HttpResponse
+from django.test import (
+    Client, RequestFactory, TestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.core.cache import cache
 
+from core import db
+from core.instrumentation import QueryBudgetMixin
+
+from .. import caching, cards
 from ..forms import PostForm
-from ..models import Group, Post, Follow
+from ..models import Comment, FeedEntry, Group, Post, Follow
+from ..utils import CursorPaginator, encode_cursor
 
 User = get_user_model()
 
@@ -20,6 +33,7 @@ CREATE_URL = 'posts:post_create'
 FOLLOW_INDEX_URL = 'posts:follow_index'
 FOLLOW_URL = 'posts:profile_follow'
 UNFOLLOW_URL = 'posts:profile_unfollow'
+SEARCH_URL = 'posts:search'
 PAGE_NOMBER = 3
 
 
@@ -139,17 +153,40 @@ class PostPagesTests(TestCase):
         """Тестируем КЕШ"""
         response1 = self.authorized_client.get(reverse(INDEX_URL))
         content1 = response1.content
-        post_count = Post.objects.count()
-        Post.objects.create(text='Тестовый текст', author=self.user)
         response2 = self.authorized_client.get(reverse(INDEX_URL))
-        content2 = response2.content
-        self.assertEqual(content1, content2)
-        cache.clear()
-        post_count1 = Post.objects.count()
+        self.assertIsNone(response2.context)
+        self.assertEqual(content1, response2.content)
+        Post.objects.create(text='Новый текст поста', author=self.user)
         response3 = self.authorized_client.get(reverse(INDEX_URL))
-        content3 = response3.content
-        self.assertNotEqual(content1, content3)
-        self.assertNotEqual(post_count, post_count1)
+        self.assertIsNotNone(response3.context)
+        self.assertNotEqual(content1, response3.content)
+        self.assertContains(response3, 'Новый текст поста')
+
+    def test_cache_scopes(self):
+        """Изменение группы сбрасывает только кеш ее ленты"""
+        group_url = reverse(GROUP_UPL, kwargs={'slug': self.group.slug})
+        profile_url = reverse(PROFILE_URL, kwargs={'username': self.user})
+        self.authorized_client.get(group_url)
+        self.authorized_client.get(profile_url)
+        self.group.description = 'Новое описание группы'
+        self.group.save()
+        response = self.authorized_client.get(group_url)
+        self.assertContains(response, 'Новое описание группы')
+        self.assertIsNone(self.authorized_client.get(profile_url).context)
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_cache_miss_reads_primary(self):
+        """Страница для общего кеша рендерится по основной базе"""
+        routed = []
+
+        def view(request):
+            routed.append(router.db_for_read(Post))
+            return HttpResponse()
+
+        request = RequestFactory().get('/replica-test/')
+        request.user = self.user
+        db.ReplicaMiddleware(caching.cache_feed('test')(view))(request)
+        self.assertEqual(routed, ['default'])
 
 
 class FollowViewsTest(TestCase):
@@ -216,6 +253,74 @@ class FollowViewsTest(TestCase):
         response = self.client_follower.get(reverse(FOLLOW_INDEX_URL))
         self.assertNotIn(post, response.context['page_obj'].object_list)
 
+    def test_feed_fan_out(self):
+        """Новые посты раскладываются по лентам подписчиков"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='TEXT')
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.follower, post=post).exists()
+        )
+        response = self.client_follower.get(reverse(FOLLOW_INDEX_URL))
+        self.assertIn(post, response.context['page_obj'].object_list)
+
+    def test_feed_follow_backfill_and_unfollow(self):
+        """Подписка переносит старые посты, отписка их убирает"""
+        post = Post.objects.create(author=self.author, text='TEXT')
+        self.client_follower.get(
+            reverse(FOLLOW_URL, kwargs={'username': self.author})
+        )
+        response = self.client_follower.get(reverse(FOLLOW_INDEX_URL))
+        self.assertIn(post, response.context['page_obj'].object_list)
+        self.client_follower.get(
+            reverse(UNFOLLOW_URL, kwargs={'username': self.author})
+        )
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.follower).exists()
+        )
+
+    @override_settings(FEED_MAX_LENGTH=2)
+    def test_feed_is_bounded(self):
+        """Лента подписок ограничена по длине"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'TEXT {i}')
+            for i in range(3)
+        ]
+        self.assertEqual(
+            set(FeedEntry.objects.filter(
+                user=self.follower
+            ).values_list('post', flat=True)),
+            {posts[1].id, posts[2].id}
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_feed_fan_out_on_read(self):
+        """Посты популярных авторов подмешиваются при чтении"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        cache.clear()
+        post = Post.objects.create(author=self.author, text='TEXT')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        response = self.client_follower.get(reverse(FOLLOW_INDEX_URL))
+        self.assertIn(post, response.context['page_obj'].object_list)
+
+    @override_settings(FEED_MAX_LENGTH=2)
+    def test_feed_filled_by_migration(self):
+        """Миграция ленты раскладывает уже существующие посты"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'TEXT {i}')
+            for i in range(3)
+        ]
+        FeedEntry.objects.all().delete()
+        migration = import_module('posts.migrations.0008_feedentry')
+        migration.fill_feeds(apps, None)
+        self.assertEqual(
+            set(FeedEntry.objects.filter(
+                user=self.follower
+            ).values_list('post', flat=True)),
+            {posts[1].id, posts[2].id}
+        )
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -257,3 +362,326 @@ class PaginatorViewsTest(TestCase):
                     reverse_name + '?page=2').context.get('page_obj')),
                     PAGE_NOMBER
                 )
+
+    def test_cursor_paginator(self):
+        """Переход по курсорам возвращает соседние страницы"""
+        url = reverse(GROUP_UPL, kwargs={'slug': self.group.slug})
+        first_page = self.authorized_client.get(url).context['page_obj']
+        self.assertTrue(first_page.has_next())
+        second_page = self.authorized_client.get(
+            url + '?' + first_page.next_query
+        ).context['page_obj']
+        self.assertEqual(second_page.number, 2)
+        self.assertEqual(len(second_page), PAGE_NOMBER)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(set(first_page).isdisjoint(second_page))
+        cache.clear()
+        previous_page = self.authorized_client.get(
+            url + '?' + second_page.previous_query
+        ).context['page_obj']
+        self.assertEqual(list(previous_page), list(first_page))
+        broken_page = self.authorized_client.get(
+            url + '?cursor=broken'
+        ).context['page_obj']
+        self.assertEqual(list(broken_page), list(first_page))
+
+    def test_tampered_cursor(self):
+        """Курсор с чужими типами значений дает первую страницу"""
+        urls = (
+            reverse(INDEX_URL),
+            reverse(GROUP_UPL, kwargs={'slug': self.group.slug}),
+            reverse('posts:api_index'),
+        )
+        values = ([None, 1], [{}, 1], [1.5, 1], [5, 5], ['2020-01-01', []])
+        for url in urls:
+            for cursor_values in values:
+                with self.subTest(url=url, values=cursor_values):
+                    cache.clear()
+                    response = self.authorized_client.get(url, {
+                        'cursor': encode_cursor(2, False, cursor_values)
+                    })
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_page_past_end_with_stale_count(self):
+        """Номер за концом ленты при устаревшем счетчике дает последнюю
+        страницу"""
+        paginator = CursorPaginator(
+            Post.objects.all(), settings.POSTS_NUMBER, count_key='test-count'
+        )
+        cache.set('test-count', 1000)
+        page = paginator.page(50)
+        self.assertEqual(page.number, 2)
+        self.assertEqual(len(page), PAGE_NOMBER)
+        self.assertEqual(cache.get('test-count'), Post.objects.count())
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовое название',
+            description='Тестовый текст',
+            slug='test-slug'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(settings.POSTS_NUMBER + PAGE_NOMBER):
+            cls.post = Post.objects.create(
+                text=f'Тестовый текст {i}', author=cls.author, group=cls.group
+            )
+        for i in range(PAGE_NOMBER):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Комментарий {i}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_views_query_budget(self):
+        """Число запросов страниц не зависит от числа постов"""
+        budgets = {
+            # + блок популярных групп
+            reverse(INDEX_URL): 4,
+            reverse(GROUP_UPL, kwargs={'slug': self.group.slug}): 4,
+            # + рекомендации авторов
+            reverse(PROFILE_URL, kwargs={'username': self.author}): 6,
+            # + поиск автора поста для ETag
+            reverse(DETAIL_URL, kwargs={'post_id': self.post.id}): 5,
+            # + рекомендации авторов
+            reverse(FOLLOW_INDEX_URL): 5,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                response = self.assertQueryBudget(budget, url)
+                page_obj = response.context.get('page_obj')
+                if page_obj is not None and page_obj.has_next():
+                    self.assertQueryBudget(
+                        budget, url + '?' + page_obj.next_query
+                    )
+
+    def test_query_headers(self):
+        """Middleware сообщает число запросов в заголовках"""
+        with self.settings(QUERY_INSTRUMENTATION=True):
+            response = self.client.get(reverse(INDEX_URL))
+        self.assertIn('X-DB-Query-Count', response)
+        self.assertEqual(response['X-DB-Duplicate-Queries'], '0')
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.match = Post.objects.create(
+            text='Котики гуляют по крыше, котики спят', author=cls.user
+        )
+        cls.weak_match = Post.objects.create(
+            text='Один котик и много собак, собаки лают', author=cls.user
+        )
+        cls.other = Post.objects.create(text='Про погоду', author=cls.user)
+
+    def search(self, query):
+        response = self.client.get(reverse(SEARCH_URL), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_ranked(self):
+        """Поиск находит посты и ранжирует их по релевантности"""
+        self.assertEqual(self.search('котики'), [self.match])
+        self.assertEqual(self.search('кот'), [self.match, self.weak_match])
+        self.assertEqual(self.search(''), [])
+
+    def test_search_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении постов"""
+        self.other.text = 'Котики и погода'
+        self.other.save()
+        self.assertIn(self.other, self.search('погода'))
+        self.assertIn(self.other, self.search('котики'))
+        Post.objects.filter(pk=self.match.pk).delete()
+        self.assertNotIn(self.match, self.search('крыше'))
+
+    def test_search_query_is_escaped(self):
+        """Спецсимволы FTS в запросе не ломают поиск"""
+        self.assertEqual(self.search('"котики* -(^'), [self.match])
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.posts = [
+            Post.objects.create(text=f'Карточка {i}', author=cls.user)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def card(self, post):
+        return cache.get(cards.card_key(post))
+
+    def test_cards_cached(self):
+        """Карточки страницы попадают в кеш и берутся из него"""
+        response = self.client.get(reverse(INDEX_URL))
+        for post in self.posts:
+            self.assertIn(self.card(post), response.content.decode())
+        post = self.posts[0]
+        cache.set(cards.card_key(post), '<article>из кеша</article>')
+        caching.bump(caching.GLOBAL)
+        response = self.client.get(reverse(INDEX_URL))
+        self.assertContains(response, 'из кеша')
+
+    def test_card_follows_edit(self):
+        """Правка поста и имени автора меняет ключ карточки"""
+        post = Post.objects.get(pk=self.posts[0].pk)
+        key = cards.card_key(post)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertNotEqual(cards.card_key(post), key)
+        self.assertContains(self.client.get(reverse(INDEX_URL)), 'Новый текст')
+        self.user.first_name = 'Лев'
+        self.user.last_name = 'Толстой'
+        self.user.save()
+        self.assertContains(self.client.get(reverse(INDEX_URL)), 'Лев Толстой')
+
+    def test_cards_read_in_bulk(self):
+        """Карточки страницы читаются одним обращением к кешу"""
+        self.client.get(reverse(PROFILE_URL, kwargs={'username': self.user}))
+        caching.bump(caching.author_scope(self.user.username))
+        with mock.patch.object(
+            cards.cache, 'get_many', wraps=cards.cache.get_many
+        ) as get_many:
+            self.client.get(
+                reverse(PROFILE_URL, kwargs={'username': self.user})
+            )
+        card_lookups = [
+            sorted(call[0][0]) for call in get_many.call_args_list
+            if str(call[0][0][0]).startswith('post_card:')
+        ]
+        self.assertEqual(
+            card_lookups,
+            [sorted(cards.card_key(post) for post in self.posts)]
+        )
+
+
+class CommentsPaginationTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.post = Post.objects.create(text='Тестовый текст', author=cls.user)
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(settings.COMMENTS_NUMBER + PAGE_NOMBER)
+        ])
+        cls.newest = list(
+            Comment.objects.order_by('-created', '-id')
+            .values_list('id', flat=True)
+        )
+
+    def test_detail_shows_first_page(self):
+        """На странице поста только первая страница новых комментариев"""
+        url = reverse(DETAIL_URL, kwargs={'post_id': self.post.id})
+        response = self.assertQueryBudget(5, url)
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.id for comment in comments],
+            self.newest[:settings.COMMENTS_NUMBER]
+        )
+        self.assertTrue(comments.has_next())
+        response = self.client.get(url + '?' + comments.next_query)
+        self.assertEqual(
+            [comment.id for comment in response.context['comments']],
+            self.newest[settings.COMMENTS_NUMBER:]
+        )
+
+    def test_load_more(self):
+        """JSON-эндпоинт отдает следующую страницу и курсор"""
+        url = reverse('posts:comments', kwargs={'post_id': self.post.id})
+        first = self.client.get(url).json()
+        self.assertEqual(
+            [comment['id'] for comment in first['comments']],
+            self.newest[:settings.COMMENTS_NUMBER]
+        )
+        self.assertIn('Комментарий', first['comments'][0]['html'])
+        second = self.client.get(url, {'comments': first['next']}).json()
+        self.assertEqual(
+            [comment['id'] for comment in second['comments']],
+            self.newest[settings.COMMENTS_NUMBER:]
+        )
+        self.assertIsNone(second['next'])
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовое название',
+            description='Тестовый текст',
+            slug='test-slug'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def assertNotModified(self, url):
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        return etag
+
+    def assertModified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_unchanged_pages_not_modified(self):
+        """Неизменные страницы отвечают 304 без запросов к постам"""
+        urls = (
+            reverse(INDEX_URL),
+            reverse(GROUP_UPL, kwargs={'slug': self.group.slug}),
+            reverse(PROFILE_URL, kwargs={'username': self.author}),
+            reverse(DETAIL_URL, kwargs={'post_id': self.post.id}),
+            reverse(FOLLOW_INDEX_URL),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                etag = self.assertNotModified(url)
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertFalse(any(
+                    'posts_comment' in query['sql']
+                    or f'LIMIT {settings.POSTS_NUMBER + 1}' in query['sql']
+                    for query in queries.captured_queries
+                ))
+
+    def test_changes_refresh_etag(self):
+        """Изменения данных страницы меняют ETag"""
+        detail = reverse(DETAIL_URL, kwargs={'post_id': self.post.id})
+        etag = self.assertNotModified(detail)
+        Comment.objects.create(post=self.post, author=self.reader, text='Да')
+        self.assertModified(detail, etag)
+        etag = self.assertNotModified(detail)
+        Post.objects.create(text='Еще пост', author=self.author)
+        self.assertModified(detail, etag)
+        follow = reverse(FOLLOW_INDEX_URL)
+        etag = self.assertNotModified(follow)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertModified(follow, etag)
+
+    def test_etag_is_per_user(self):
+        """ETag страницы зависит от пользователя"""
+        url = reverse(PROFILE_URL, kwargs={'username': self.author})
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(Client().get(url)['ETag'], etag)
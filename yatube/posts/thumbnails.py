@@ -0,0 +1,69 @@
+"""Предварительная генерация миниатюр картинок постов.
+
+Миниатюры известных размеров строит фоновая задача ``jobs`` после
+сохранения поста и записывает их имена в ``Thumbnail``. Шаблоны только
+читают готовые миниатюры и показывают заглушку, пока миниатюра не
+готова. ``manage.py generate_thumbnails`` ставит в очередь картинки без
+миниатюр: старые загрузки и те, чья задача так и не выполнилась.
+"""
+from django.conf import settings
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from jobs.queue import task
+
+from .models import Post, Thumbnail
+
+
+def cached(name, alias='card'):
+    """Готовая миниатюра или None, без обращения к картинке."""
+    thumbnail = Thumbnail.objects.filter(
+        image=name, alias=alias
+    ).values_list('name', flat=True).first()
+    if thumbnail is None:
+        return None
+    return ImageFile(thumbnail, default.storage)
+
+
+def missing(names):
+    """Картинки из ``names``, у которых готовы не все миниатюры."""
+    names = set(names)
+    ready = {}
+    for image, alias in Thumbnail.objects.filter(
+        image__in=names
+    ).values_list('image', 'alias'):
+        ready.setdefault(image, set()).add(alias)
+    aliases = set(settings.POST_THUMBNAILS)
+    return {name for name in names if not aliases <= ready.get(name, set())}
+
+
+def forget(name):
+    """Удаляет миниатюры картинки и записи о них."""
+    Thumbnail.objects.filter(image=name).delete()
+    default.kvstore.delete(ImageFile(name, default.storage))
+
+
+def _touch_posts(name):
+    """Обновляет карточки и ленты постов, где заглушка сменилась картинкой."""
+    for post in Post.objects.filter(image=name).select_related('author'):
+        post.save(update_fields=['updated'])
+
+
+@task(priority=10, key=lambda name: f'thumbnails:{name}')
+def generate(name):
+    """Строит все миниатюры картинки."""
+    for alias, (geometry, options) in settings.POST_THUMBNAILS.items():
+        thumbnail = get_thumbnail(name, geometry, **options)
+        if not thumbnail.exists():
+            # картинки нет в хранилище, и миниатюра не построена
+            continue
+        Thumbnail.objects.update_or_create(
+            image=name, alias=alias, defaults={'name': thumbnail.name}
+        )
+    _touch_posts(name)
+
+
+def schedule(name):
+    """Ставит картинку в очередь на построение миниатюр."""
+    if name:
+        generate.delay(name)
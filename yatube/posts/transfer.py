@@ -0,0 +1,205 @@
+"""Потоковая выгрузка и загрузка данных постов в NDJSON.
+
+Каждая строка — один объект: ``{"model": "post", "pk": 1, "fields": {}}``.
+Выгрузка читает таблицы через ``iterator()`` и не держит их в памяти.
+Загрузка пишет пачками ``bulk_create`` в отдельных транзакциях, а авторов
+и группы находит через словари «имя -> id», заполняемые по мере чтения.
+"""
+import json
+from contextlib import contextmanager
+from itertools import groupby, islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+CHUNK_SIZE = 2000
+MODELS = ('group', 'post', 'comment', 'follow')
+
+
+def _rows(queryset, *fields, chunk_size=CHUNK_SIZE):
+    return queryset.order_by('pk').values_list(*fields).iterator(
+        chunk_size=chunk_size
+    )
+
+
+def export_records(chunk_size=CHUNK_SIZE):
+    """Генератор записей всех моделей в порядке зависимостей."""
+    for pk, title, slug, description in _rows(
+        Group.objects, 'pk', 'title', 'slug', 'description',
+        chunk_size=chunk_size
+    ):
+        yield {'model': 'group', 'pk': pk, 'fields': {
+            'title': title, 'slug': slug, 'description': description,
+        }}
+    for pk, text, pub_date, author, group, image in _rows(
+        Post.objects, 'pk', 'text', 'pub_date', 'author__username',
+        'group__slug', 'image', chunk_size=chunk_size
+    ):
+        yield {'model': 'post', 'pk': pk, 'fields': {
+            'text': text, 'pub_date': pub_date.isoformat(),
+            'author': author, 'group': group, 'image': image,
+        }}
+    for pk, post, author, text, created in _rows(
+        Comment.objects, 'pk', 'post_id', 'author__username', 'text',
+        'created', chunk_size=chunk_size
+    ):
+        yield {'model': 'comment', 'pk': pk, 'fields': {
+            'post': post, 'author': author, 'text': text,
+            'created': created.isoformat(),
+        }}
+    for pk, user, author in _rows(
+        Follow.objects, 'pk', 'user__username', 'author__username',
+        chunk_size=chunk_size
+    ):
+        yield {'model': 'follow', 'pk': pk, 'fields': {
+            'user': user, 'author': author,
+        }}
+
+
+def export_lines(chunk_size=CHUNK_SIZE):
+    for record in export_records(chunk_size):
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def parse_lines(lines):
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def chunks(records, size):
+    """Пачки подряд идущих записей одной модели."""
+    for model, group in groupby(records, key=lambda record: record['model']):
+        while True:
+            batch = list(islice(group, size))
+            if not batch:
+                break
+            yield model, batch
+
+
+@contextmanager
+def keep_auto_now_add(*fields):
+    """Сохраняет даты из выгрузки вместо текущего времени."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Importer:
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.users = {}
+        self.groups = {}
+        self.post_offset = Post.objects.aggregate(top=Max('pk'))['top'] or 0
+        self.authors = set()
+        self.slugs = set()
+        self.counts = dict.fromkeys(MODELS, 0)
+
+    def resolve_users(self, usernames):
+        missing = {name for name in usernames if name not in self.users}
+        if not missing:
+            return
+        self.users.update(
+            User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'pk')
+        )
+        absent = missing - self.users.keys()
+        if absent:
+            password = make_password(None)
+            User.objects.bulk_create(
+                [User(username=name, password=password) for name in absent],
+                ignore_conflicts=True
+            )
+            self.users.update(
+                User.objects.filter(
+                    username__in=absent
+                ).values_list('username', 'pk')
+            )
+
+    def resolve_groups(self, slugs):
+        missing = {slug for slug in slugs if slug and slug not in self.groups}
+        if missing:
+            self.groups.update(
+                Group.objects.filter(
+                    slug__in=missing
+                ).values_list('slug', 'pk')
+            )
+
+    def load_group(self, batch):
+        Group.objects.bulk_create(
+            [Group(**record['fields']) for record in batch],
+            ignore_conflicts=True
+        )
+        self.slugs.update(record['fields']['slug'] for record in batch)
+        self.resolve_groups(record['fields']['slug'] for record in batch)
+
+    def load_post(self, batch):
+        fields = [record['fields'] for record in batch]
+        self.resolve_users(item['author'] for item in fields)
+        self.resolve_groups(item['group'] for item in fields)
+        Post.objects.bulk_create([
+            Post(
+                pk=record['pk'] + self.post_offset,
+                text=item['text'],
+                pub_date=parse_datetime(item['pub_date']),
+                author_id=self.users[item['author']],
+                group_id=self.groups.get(item['group']),
+                image=item['image'],
+            )
+            for record, item in zip(batch, fields)
+        ], ignore_conflicts=True)
+        self.authors.update(item['author'] for item in fields)
+        self.slugs.update(item['group'] for item in fields if item['group'])
+
+    def load_comment(self, batch):
+        fields = [record['fields'] for record in batch]
+        self.resolve_users(item['author'] for item in fields)
+        Comment.objects.bulk_create([
+            Comment(
+                post_id=item['post'] + self.post_offset,
+                author_id=self.users[item['author']],
+                text=item['text'],
+                created=parse_datetime(item['created']),
+            )
+            for item in fields
+        ])
+
+    def load_follow(self, batch):
+        fields = [record['fields'] for record in batch]
+        self.resolve_users(
+            name for item in fields for name in (item['user'], item['author'])
+        )
+        Follow.objects.bulk_create([
+            Follow(
+                user_id=self.users[item['user']],
+                author_id=self.users[item['author']],
+            )
+            for item in fields
+        ], ignore_conflicts=True)
+        self.authors.update(item['author'] for item in fields)
+
+    def load(self, records):
+        with keep_auto_now_add(
+            Post._meta.get_field('pub_date'),
+            Comment._meta.get_field('created'),
+        ):
+            for model, batch in chunks(records, self.chunk_size):
+                if model not in MODELS:
+                    raise ValueError(f'Неизвестная модель: {model}')
+                with transaction.atomic():
+                    getattr(self, f'load_{model}')(batch)
+                self.counts[model] += len(batch)
+        return self.counts
@@ -0,0 +1,107 @@
+"""Рейтинг популярных постов и групп.
+
+Оценка поста — затухающая сумма его событий за окно ``TRENDING_WINDOW``:
+публикации и каждого комментария. Вес события уменьшается вдвое каждые
+``TRENDING_HALF_LIFE`` секунд. Оценка группы — сумма оценок ее постов.
+
+Окно делится на ``TRENDING_SLICES`` срезов. Комментарии каждого среза
+считаются по постам в базе через индекс по ``created``, и весь срез
+получает вес своей середины. Так в Python приходят только пары (пост,
+число комментариев) без разбора дат, а ошибка веса не превышает
+половины среза. В памяти остается только словарь оценок постов.
+Лучшие посты и группы записываются в ``TrendingPost`` и
+``TrendingGroup``, страницы читают только эти таблицы.
+"""
+import heapq
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Comment, Post, TrendingGroup, TrendingPost
+
+COMMENT_WEIGHT = 1.0
+POST_WEIGHT = 3.0
+BATCH_SIZE = 10_000
+
+
+def _decay(now):
+    rate = math.log(2) / settings.TRENDING_HALF_LIFE
+    now = now.timestamp()
+
+    def decay(moment):
+        return math.exp(rate * (moment.timestamp() - now))
+    return decay
+
+
+def _batched(items, size=BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def scores(now=None):
+    """Оценки постов и групп за окно до момента ``now``."""
+    now = now or timezone.now()
+    start = now - timedelta(seconds=settings.TRENDING_WINDOW)
+    decay = _decay(now)
+    posts = defaultdict(float)
+    step = (now - start) / settings.TRENDING_SLICES
+    bounds = [start + step * number for number in range(
+        settings.TRENDING_SLICES
+    )] + [now]
+    for lower, upper in zip(bounds, bounds[1:]):
+        weight = COMMENT_WEIGHT * decay(lower + step / 2)
+        counts = Comment.objects.filter(
+            created__gte=lower, created__lt=upper
+        ).order_by().values_list('post_id').annotate(comments=Count('id'))
+        for post_id, comments in counts.iterator(chunk_size=BATCH_SIZE):
+            posts[post_id] += weight * comments
+    groups = {}
+    published = Post.objects.filter(
+        pub_date__gte=start, pub_date__lte=now
+    ).order_by().values_list('id', 'group_id', 'pub_date')
+    for post_id, group_id, pub_date in published.iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        posts[post_id] += POST_WEIGHT * decay(pub_date)
+        groups[post_id] = group_id
+    # посты старше окна, которые в нем обсуждают
+    for batch in _batched(set(posts) - set(groups)):
+        groups.update(
+            Post.objects.filter(id__in=batch).values_list('id', 'group_id')
+        )
+    group_scores = defaultdict(float)
+    for post_id, score in posts.items():
+        if groups.get(post_id):
+            group_scores[groups[post_id]] += score
+    return posts, group_scores
+
+
+def _top(scores, limit):
+    return heapq.nlargest(
+        limit, scores.items(), key=lambda item: (item[1], -item[0])
+    )
+
+
+def rank(now=None):
+    """Пересчитывает таблицы рейтинга, возвращает число постов и групп."""
+    posts, groups = scores(now)
+    top_posts = _top(posts, settings.TRENDING_POSTS)
+    top_groups = _top(groups, settings.TRENDING_GROUPS)
+    with transaction.atomic():
+        TrendingPost.objects.all().delete()
+        TrendingGroup.objects.all().delete()
+        TrendingPost.objects.bulk_create(
+            TrendingPost(post_id=post_id, score=score)
+            for post_id, score in top_posts
+        )
+        TrendingGroup.objects.bulk_create(
+            TrendingGroup(group_id=group_id, score=score)
+            for group_id, score in top_groups
+        )
+    return len(top_posts), len(top_groups)
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 
 app_name = 'posts'
@@ -11,12 +11,19 @@ urlpatterns = [
     path('create/', views.post_create, name='post_create'),
     path('posts/<post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<post_id>/delete/', views.post_delete, name='post_delete'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='comments',
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
         name='add_comment',
     ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('trending/', views.trending, name='trending'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -27,5 +34,10 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/posts/<int:post_id>/', api.post_detail, name='api_post_detail'),
+    path('api/group/<slug:slug>/', api.group_posts, name='api_group'),
+    path('api/profile/<str:username>/', api.profile, name='api_profile'),
+    path('api/follow/', api.follow_index, name='api_follow_index'),
     path('', views.index, name='index'),
 ]
@@ -1,8 +1,317 @@
-from django.core.paginator import Paginator
+import binascii
+import json
+
 from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.http import QueryDict
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+DEFAULT_ORDERING = ('-pub_date', '-id')
+COMMENTS_ORDERING = ('-created', '-id')
+COMMENTS_CURSOR = 'comments'
+
+
+def encode_cursor(number, reverse, values):
+    payload = json.dumps([number, reverse, values], separators=(',', ':'))
+    return urlsafe_base64_encode(payload.encode())
+
+
+def decode_cursor(token):
+    try:
+        number, reverse, values = json.loads(urlsafe_base64_decode(token))
+    except (ValueError, TypeError, binascii.Error):
+        return None
+    if not isinstance(number, int) or not isinstance(values, list):
+        return None
+    # в курсоре бывают только даты в isoformat и целые id
+    if not all(isinstance(value, (str, int)) for value in values):
+        return None
+    return max(number, 1), bool(reverse), values
+
+
+class CursorPage(Page):
+    """Страница keyset-пагинации с курсорами на соседние страницы."""
+
+    def __init__(self, object_list, number, paginator, has_next,
+                 has_previous):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def start_index(self):
+        if not self.object_list:
+            return 0
+        return self.paginator.per_page * (self.number - 1) + 1
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1
+
+    @cached_property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return encode_cursor(
+            self.next_page_number(), False,
+            self.paginator.cursor_values(self.object_list[-1])
+        )
+
+    @cached_property
+    def previous_cursor(self):
+        if not self.has_previous() or not self.object_list:
+            return None
+        return encode_cursor(
+            self.previous_page_number(), True,
+            self.paginator.cursor_values(self.object_list[0])
+        )
+
+    @property
+    def first_query(self):
+        return self.paginator.query()
+
+    @property
+    def next_query(self):
+        return self.paginator.cursor_query(self.next_cursor)
+
+    @property
+    def previous_query(self):
+        if self.previous_page_number() == 1 or not self.previous_cursor:
+            return self.first_query
+        return self.paginator.cursor_query(self.previous_cursor)
+
+    @property
+    def page_window(self):
+        """Ограниченное окно номеров: соседние страницы и текущая."""
+        window = []
+        if self.has_previous():
+            window.append((self.previous_page_number(), self.previous_query))
+        window.append((self.number, None))
+        if self.has_next():
+            window.append((self.next_page_number(), self.next_query))
+        return window
+
+
+class WindowedPage(Page):
+    """Страница с ограниченным окном номеров вокруг текущей."""
+
+    @property
+    def first_query(self):
+        return self.paginator.query()
+
+    @property
+    def next_query(self):
+        return self.paginator.page_query(self.next_page_number())
+
+    @property
+    def previous_query(self):
+        return self.paginator.page_query(self.previous_page_number())
+
+    @property
+    def page_window(self):
+        size = self.paginator.window
+        first = max(self.number - size, 1)
+        last = min(self.number + size, self.paginator.num_pages)
+        return [
+            (number, None if number == self.number
+             else self.paginator.page_query(number))
+            for number in range(first, last + 1)
+        ]
+
+
+class QueryParamsMixin:
+    """Строки запроса для ссылок на страницы с сохранением GET-параметров."""
+    cursor_param = 'cursor'
+    page_param = 'page'
+    params = None
+
+    def query(self, **values):
+        params = QueryDict(mutable=True)
+        if self.params is not None:
+            params = self.params.copy()
+        params.pop(self.cursor_param, None)
+        params.pop(self.page_param, None)
+        for key, value in values.items():
+            params[key] = value
+        return params.urlencode()
+
+    def cursor_query(self, cursor):
+        return self.query(**{self.cursor_param: cursor})
+
+    def page_query(self, number):
+        if number == 1:
+            return self.query()
+        return self.query(**{self.page_param: number})
+
+
+class WindowedPaginator(QueryParamsMixin, Paginator):
+    """Обычная пагинация по номерам с ограниченным окном ссылок.
+
+    Подходит для уже ограниченных последовательностей, например
+    ранжированных результатов поиска.
+    """
+
+    def __init__(self, object_list, per_page, params=None, window=2):
+        super().__init__(object_list, per_page)
+        self.params = params
+        self.window = window
+
+    def _get_page(self, *args, **kwargs):
+        return WindowedPage(*args, **kwargs)
+
+
+class CursorPaginator(QueryParamsMixin, Paginator):
+    """Keyset-пагинация по (pub_date, id) вместо LIMIT/OFFSET.
+
+    Страницы выбираются условием по ключу сортировки последней показанной
+    записи, поэтому глубина страницы не влияет на стоимость запроса.
+    Общее число записей считается только по требованию и может
+    кешироваться по ключу ``count_key``.
+    """
+
+    def __init__(self, object_list, per_page, ordering=DEFAULT_ORDERING,
+                 params=None, cursor_param='cursor', page_param='page',
+                 count_key=None, count_timeout=None):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = ordering
+        self.params = params
+        self.cursor_param = cursor_param
+        self.page_param = page_param
+        self.count_key = count_key
+        self.count_timeout = count_timeout
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return self.object_list.count()
+        return cache.get_or_set(
+            self.count_key, self.object_list.count, self.count_timeout
+        )
+
+    def cursor_values(self, obj):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            if isinstance(obj, dict):
+                value = obj[name]
+            else:
+                value = getattr(obj, name)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        return values
+
+    def _keyset_filter(self, values, reverse):
+        names = [field.lstrip('-') for field in self.ordering]
+        model = self.object_list.model
+        values = [
+            model._meta.get_field(name).to_python(value)
+            for name, value in zip(names, values)
+        ]
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            descending = field.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            step = Q(**{f'{names[i]}__{lookup}': values[i]})
+            for name, value in zip(names[:i], values[:i]):
+                step &= Q(**{name: value})
+            condition |= step
+        return condition
+
+    def _rows(self, number):
+        bottom = (number - 1) * self.per_page
+        return list(self.object_list[bottom:bottom + self.per_page + 1])
+
+    def page(self, number):
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        rows = self._rows(number)
+        if not rows and number > 1:
+            # кешированное число записей могло устареть: последняя
+            # страница берется по свежему count, и если записи за это
+            # время исчезли, отдается пустая страница
+            if self.count_key is not None:
+                cache.delete(self.count_key)
+            self.__dict__.pop('count', None)
+            self.__dict__.pop('num_pages', None)
+            number = min(number - 1, self.num_pages)
+            rows = self._rows(number)
+        return CursorPage(
+            rows[:self.per_page], number, self,
+            has_next=len(rows) > self.per_page,
+            has_previous=number > 1,
+        )
+
+    def cursor_page(self, token):
+        decoded = decode_cursor(token) if token else None
+        if decoded is None:
+            return self.page(1)
+        number, reverse, values = decoded
+        if len(values) != len(self.ordering):
+            return self.page(1)
+        try:
+            condition = self._keyset_filter(values, reverse)
+        except (ValueError, TypeError, ValidationError):
+            return self.page(1)
+        queryset = self.object_list.filter(condition)
+        if reverse:
+            queryset = queryset.reverse()
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not reverse:
+            return CursorPage(
+                rows, number, self, has_next=has_more, has_previous=True
+            )
+        rows.reverse()
+        if not has_more:
+            number = 1
+        return CursorPage(
+            rows, number, self, has_next=True, has_previous=has_more
+        )
+
+    def get_page(self, number):
+        return self.page(number)
+
+
+def paginator_self(request, post, **kwargs):
+    paginator = CursorPaginator(
+        post, settings.POSTS_NUMBER, params=request.GET, **kwargs
+    )
+    cursor = request.GET.get(paginator.cursor_param)
+    if cursor:
+        return paginator.cursor_page(cursor)
+    return paginator.page(request.GET.get(paginator.page_param))
+
+
+def paginator_windowed(request, object_list):
+    paginator = WindowedPaginator(
+        object_list, settings.POSTS_NUMBER, params=request.GET
+    )
+    return paginator.get_page(request.GET.get(paginator.page_param))
 
 
-def paginator_self(request, post):
-    paginator = Paginator(post, settings.POSTS_NUMBER)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+def paginator_comments(request, post):
+    """Страница комментариев поста, начиная с самых новых."""
+    paginator = CursorPaginator(
+        post.comments.select_related('author'), settings.COMMENTS_NUMBER,
+        ordering=COMMENTS_ORDERING, params=request.GET,
+        cursor_param=COMMENTS_CURSOR, page_param='comments_page'
+    )
+    return paginator.cursor_page(request.GET.get(COMMENTS_CURSOR))
@@ -1,17 +1,23 @@
+from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.template.loader import render_to_string
+from django.urls import reverse
 
-from .models import Post, Group, User, Follow
+from .models import Post, Group, User
 from .forms import PostForm, CommentForm
-from .utils import paginator_self
+from .utils import paginator_comments, paginator_self, paginator_windowed
+from . import caching, cards, feed, fulltext, graph, suggestions, thumbnails
 
 
-@cache_page(20, key_prefix='index_page')
+# на главной есть блок популярных групп
+@caching.conditional_feed([caching.GLOBAL, caching.TRENDING])
+@caching.cache_feed([caching.GLOBAL, caching.TRENDING])
 def index(request):
     template = 'posts/index.html'
     post_list = Post.objects.select_related('author', 'group').all()
     page_obj = paginator_self(request, post_list)
+    cards.attach(page_obj)
     context = {
         'page_obj': page_obj,
         'index': True,
@@ -19,11 +25,16 @@ def index(request):
     return render(request, template, context)
 
 
+@caching.conditional_feed(
+    lambda request, slug: caching.group_scope(slug)
+)
+@caching.cache_feed(lambda request, slug: caching.group_scope(slug))
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    post_list = group.posts.select_related('author', 'group')
     page_obj = paginator_self(request, post_list)
+    cards.attach(page_obj)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -31,30 +42,55 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+def _profile_scopes(request, username):
+    scopes = [caching.author_scope(username)]
+    if request.user.is_authenticated:
+        # на странице есть рекомендации для читателя
+        scopes += [
+            caching.follow_scope(request.user.pk), caching.SUGGESTIONS
+        ]
+    return scopes
+
+
+@caching.conditional_feed(_profile_scopes)
+@caching.cache_feed(_profile_scopes)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
     user = request.user
-    post_list = author.posts.all()
+    post_list = author.posts.select_related('author', 'group')
     page_obj = paginator_self(request, post_list)
-    following = user.is_authenticated and Follow.objects.filter(
-        author=author,
-        user=user
-    ).exists()
+    cards.attach(page_obj)
+    following = user.is_authenticated and graph.is_following(
+        user.pk, author.pk
+    )
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following
+        'following': following,
+        'suggestions': suggestions.for_user(user),
     }
     return render(request, template, context)
 
 
+def _post_scopes(request, post_id):
+    username = Post.objects.filter(pk=post_id).values_list(
+        'author__username', flat=True
+    ).first()
+    if username is None:
+        return None
+    # в карточке автора на странице поста есть число его постов
+    return [caching.post_scope(post_id), caching.author_scope(username)]
+
+
+@caching.conditional_feed(_post_scopes)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
     post = get_object_or_404(
-        Post.objects.select_related('author', 'group'), id=post_id)
+        Post.objects.select_related('author__stats', 'group'), id=post_id)
     form = CommentForm()
-    comments = post.comments.all()
+    comments = paginator_comments(request, post)
     context = {
         'post': post,
         'form': form,
@@ -63,6 +99,30 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    page = paginator_comments(request, post)
+    comments = [
+        {
+            'id': comment.id,
+            'text': comment.text,
+            'created': comment.created.isoformat(),
+            'author': {
+                'username': comment.author.username,
+                'full_name': comment.author.get_full_name(),
+                'url': reverse(
+                    'posts:profile', args=[comment.author.username]
+                ),
+            },
+            'html': render_to_string(
+                'posts/includes/comment.html', {'comment': comment}
+            ),
+        }
+        for comment in page
+    ]
+    return JsonResponse({'comments': comments, 'next': page.next_cursor})
+
+
 @login_required
 def post_create(request):
     template = 'posts/post_create.html'
@@ -73,6 +133,7 @@ def post_create(request):
     post = form.save(commit=False)
     post.author = request.user
     post.save()
+    thumbnails.schedule(post.image.name)
     return redirect('posts:profile', username=request.user)
 
 
@@ -92,7 +153,8 @@ def post_edit(request, post_id):
         'is_edit': True,
     }
     if form.is_valid():
-        form.save()
+        post = form.save()
+        thumbnails.schedule(post.image.name)
         return redirect('posts:post_detail', post_id=post_id)
     return render(request, template, context)
 
@@ -121,33 +183,61 @@ def add_comment(request, post_id):
 
 
 @login_required
+@caching.conditional_feed(lambda request: [
+    caching.GLOBAL, caching.follow_scope(request.user.pk),
+    caching.SUGGESTIONS
+])
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
+    post_list = feed.timeline(request.user).select_related('author', 'group')
     page_obj = paginator_self(request, post_list)
+    cards.attach(page_obj)
     context = {
         'page_obj': page_obj,
         'follow': True,
+        'suggestions': suggestions.for_user(request.user),
     }
     return render(request, 'posts/follow.html', context)
 
 
+# правка и удаление постов и переименование авторов меняют GLOBAL
+@caching.conditional_feed([caching.GLOBAL, caching.TRENDING])
+@caching.cache_feed([caching.GLOBAL, caching.TRENDING])
+def trending(request):
+    template = 'posts/trending.html'
+    post_list = Post.objects.filter(
+        trending__isnull=False
+    ).select_related('author', 'group').order_by('-trending__score', '-id')
+    page_obj = paginator_windowed(request, post_list)
+    cards.attach(page_obj)
+    context = {
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    page_obj = paginator_windowed(request, fulltext.search(query))
+    cards.attach(page_obj)
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+    }
+    return render(request, template, context)
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
     if author != user:
-        Follow.objects.get_or_create(
-            user=user,
-            author=author
-        )
-        return redirect('posts:profile', username=author)
+        graph.follow(user.pk, [author.pk])
     return redirect('posts:profile', username=author)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(
-        user=request.user,
-        author=author).delete()
+    graph.unfollow(request.user.pk, [author.pk])
     return redirect('posts:profile', username=author)
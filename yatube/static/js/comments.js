@@ -0,0 +1,24 @@
+(function () {
+  var button = document.getElementById('more-comments');
+  var list = document.getElementById('comments');
+  if (!button || !list) {
+    return;
+  }
+  button.addEventListener('click', function (event) {
+    event.preventDefault();
+    var url = button.dataset.url + '?comments=' +
+      encodeURIComponent(button.dataset.cursor);
+    fetch(url, {headers: {'Accept': 'application/json'}})
+      .then(function (response) { return response.json(); })
+      .then(function (data) {
+        data.comments.forEach(function (comment) {
+          list.insertAdjacentHTML('beforeend', comment.html);
+        });
+        if (data.next) {
+          button.dataset.cursor = data.next;
+        } else {
+          button.remove();
+        }
+      });
+  });
+})();
@@ -12,19 +12,66 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 
 import os
+import tempfile
+
+from core.template_loaders import profile_loaders
 
 TEXT_NUMBER = 15
 POSTS_NUMBER = 10
+COMMENTS_NUMBER = 20
+FEED_MAX_LENGTH = 500
+FEED_FANOUT_LIMIT = 1000
+FEED_CELEBRITIES_TIMEOUT = 300
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+FEED_CACHE_LOCK_TIMEOUT = 10
+FOLLOW_GRAPH_CACHE_SIZE = 10_000
+FOLLOW_GRAPH_MAX_SET = 5_000
+SUGGESTIONS_STORED = 20
+SUGGESTIONS_NUMBER = 5
+TRENDING_WINDOW = 60 * 60 * 24 * 3
+TRENDING_HALF_LIFE = 60 * 60 * 12
+TRENDING_SLICES = 72
+TRENDING_POSTS = 100
+TRENDING_GROUPS = 10
+POST_CARD_TIMEOUT = 60 * 60 * 24 * 7
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+SEARCH_MAX_RESULTS = 1000
+POST_IMAGE_MAX_SIZE = 1600
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_MAX_BYTES = 20 * 1024 * 1024
+POST_IMAGE_FORMAT = 'WEBP'
+POST_IMAGE_QUALITY = 82
+# файл без ссылок моложе стольких секунд не удаляется: его могла только
+# что переиспользовать загрузка, пост которой еще не сохранен
+POST_IMAGE_RELEASE_GRACE = 10 * 60
+# True — задачи выполняются сразу при постановке, без manage.py runworker
+JOBS_EAGER = False
+JOBS_CONCURRENCY = 2
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_DELAY = 10
+JOBS_LOCK_TIMEOUT = 60 * 10
+JOBS_POLL_INTERVAL = 1
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'yatube-cache.sqlite3'),
+        'KEY_PREFIX': 'yatube',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'POOL_SIZE': 4,
+        },
     }
 }
 
+# тесты работают со своим файлом кеша, см. core.testing
+TEST_RUNNER = 'core.testing.TestRunner'
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
@@ -38,7 +85,8 @@ SECRET_KEY = 'y^^9-+6hov(2=+u$8dd2^#h-nu4^nzbuz@nq6)icj@1ba++vw0'
 DEBUG = True
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_BACKEND = 'jobs.mail.QueuedEmailBackend'
+JOBS_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 LOGIN_URL = 'users:login'
@@ -65,12 +113,26 @@ INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
+    'jobs.apps.JobsConfig',
     'about.apps.AboutConfig',
     'sorl.thumbnail',
     'debug_toolbar',
 ]
 
+QUERY_INSTRUMENTATION = DEBUG
+
+# доля запросов, профилируемых cProfile (core.profiling); 0 — выключено
+PROFILE_SAMPLE_RATE = 0
+# запросы дольше стольких миллисекунд записываются всегда; None — нет
+PROFILE_SLOW_MS = None
+PROFILE_DIR = os.path.join(tempfile.gettempdir(), 'yatube-profiles')
+PROFILE_MAX_SAMPLES = 500
+
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
+    'core.instrumentation.QueryCountMiddleware',
+    'core.instrumentation.TemplateTimingMiddleware',
+    'core.db.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -84,11 +146,23 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# default — без кеша, cached — кеш шаблонов, inlined — кеш и подстановка
+# частых включений (core.template_loaders)
+TEMPLATE_PROFILE = 'default' if DEBUG else 'inlined'
+TEMPLATE_INLINE_INCLUDES = [
+    'includes/header.html',
+    'includes/footer.html',
+    'posts/includes/comment.html',
+    'posts/includes/paginator.html',
+    'posts/includes/switcher.html',
+    'posts/includes/thumbnail.html',
+]
+TEMPLATE_TIMING = False
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
+        'APP_DIRS': TEMPLATE_PROFILE == 'default',
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -100,6 +174,10 @@ TEMPLATES = [
         },
     },
 ]
+if TEMPLATE_PROFILE != 'default':
+    TEMPLATES[0]['OPTIONS']['loaders'] = profile_loaders(
+        TEMPLATE_PROFILE, TEMPLATE_INLINE_INCLUDES
+    )
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
@@ -116,6 +194,18 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения. Локально это копии основной базы,
+# обновляемые командой sync_replicas, например:
+# DATABASES['replica'] = {
+#     'ENGINE': 'django.db.backends.sqlite3',
+#     'NAME': os.path.join(BASE_DIR, 'db.replica.sqlite3'),
+#     'TEST': {'MIRROR': 'default'},
+# }
+# DATABASE_REPLICAS = ['replica']
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -154,3 +244,8 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+# имена с хешем и сжатые копии .gz/.br, см. core.staticfiles
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStorage'
+# кеширование статики и медиа без хеша в имени, отдаваемых core.wsgi
+UNHASHED_FILES_MAX_AGE = 60 * 60
@@ -11,6 +11,9 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from core.wsgi import FileServer
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
-application = get_wsgi_application()
+# статика и медиа отдаются до Django, см. core.wsgi
+application = FileServer(get_wsgi_application())